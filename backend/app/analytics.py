@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from app.config import env_int, env_float
+from app.cache import TTLCache
+from app.database import travels_reporting_collection
+from app.metrics import register_cache
+
+# ---------------------------------------------------------------------
+# 📈 Fleet analytics (server-side aggregation pipelines)
+# ---------------------------------------------------------------------
+ANALYTICS_CACHE_TTL = env_float("ANALYTICS_CACHE_TTL", 60)
+ANALYTICS_CACHE_SIZE = env_int("ANALYTICS_CACHE_SIZE", 256)
+ANALYTICS_MAX_TIME_MS = env_int("ANALYTICS_MAX_TIME_MS", 30000)
+
+METRICS = ("totals", "top_drivers", "trend", "trip_length")
+GRANULARITIES = ("day", "week", "month")
+TRIP_PERCENTILES = [0.5, 0.9, 0.95, 0.99]
+
+analytics_cache = TTLCache(maxsize=ANALYTICS_CACHE_SIZE, ttl=ANALYTICS_CACHE_TTL)
+register_cache("analytics", analytics_cache)
+
+_SUMS = {
+    "trips": {"$sum": 1},
+    "total_km": {"$sum": "$total_km"},
+    "official_km": {"$sum": "$official_km"},
+    "private_km": {"$sum": "$private_km"},
+}
+
+
+def match_stage(date_from: Optional[str], date_to: Optional[str], user_email: Optional[str]) -> dict:
+    """
+    Filter on created_at rather than the `date` string so the same
+    (user_email, created_at) index that serves a user's own log listing
+    also serves per-user ranges, and (created_at, _id) serves fleet-wide ones.
+    """
+    query = {}
+    if user_email:
+        query["user_email"] = user_email
+    bounds = {}
+    if date_from:
+        bounds["$gte"] = datetime.strptime(date_from, "%Y-%m-%d")
+    if date_to:
+        bounds["$lt"] = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)
+    if bounds:
+        query["created_at"] = bounds
+    return {"$match": query}
+
+
+def _facets(metrics: list, granularity: str, top: int) -> dict:
+    facets = {}
+    if "totals" in metrics:
+        facets["totals"] = [{"$group": {"_id": None, **_SUMS}}, {"$project": {"_id": 0}}]
+        facets["driver_count"] = [{"$group": {"_id": "$user_email"}}, {"$count": "drivers"}]
+    if "top_drivers" in metrics:
+        facets["top_drivers"] = [
+            {"$group": {"_id": "$user_email", **_SUMS}},
+            {"$sort": {"private_km": -1, "_id": 1}},
+            {"$limit": top},
+            {"$project": {"_id": 0, "user_email": "$_id", "trips": 1, "total_km": 1, "official_km": 1, "private_km": 1}},
+        ]
+    if "trend" in metrics:
+        period = {"date": "$created_at", "unit": granularity}
+        if granularity == "week":
+            period["startOfWeek"] = "monday"
+        facets["trend"] = [
+            {"$group": {"_id": {"$dateTrunc": period}, **_SUMS}},
+            {"$sort": {"_id": 1}},
+            {"$project": {"_id": 0, "period": {"$dateToString": {"format": "%Y-%m-%d", "date": "$_id"}},
+                          "trips": 1, "total_km": 1, "official_km": 1, "private_km": 1}},
+        ]
+    if "trip_length" in metrics:
+        # $percentile needs MongoDB 7.0+
+        facets["trip_length"] = [
+            {"$group": {
+                "_id": None,
+                "percentiles": {"$percentile": {"input": "$total_km", "p": TRIP_PERCENTILES, "method": "approximate"}},
+                "avg": {"$avg": "$total_km"},
+                "max": {"$max": "$total_km"},
+            }},
+            {"$project": {"_id": 0, "percentiles": 1, "avg": 1, "max": 1}},
+        ]
+    return facets
+
+
+def build_pipeline(metrics: list, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                   user_email: Optional[str] = None, granularity: str = "day", top: int = 10) -> list:
+    return [
+        match_stage(date_from, date_to, user_email),
+        {"$project": {"_id": 0, "user_email": 1, "created_at": 1, "total_km": 1, "official_km": 1, "private_km": 1}},
+        {"$facet": _facets(metrics, granularity, top)},
+    ]
+
+
+def _shape(result: dict, metrics: list) -> dict:
+    response = {}
+    if "totals" in metrics:
+        totals = result["totals"][0] if result["totals"] else {"trips": 0, "total_km": 0, "official_km": 0, "private_km": 0}
+        totals["drivers"] = result["driver_count"][0]["drivers"] if result["driver_count"] else 0
+        response["totals"] = totals
+    if "top_drivers" in metrics:
+        response["top_drivers"] = result["top_drivers"]
+    if "trend" in metrics:
+        response["trend"] = result["trend"]
+    if "trip_length" in metrics:
+        stats = result["trip_length"][0] if result["trip_length"] else {"percentiles": [None] * len(TRIP_PERCENTILES), "avg": None, "max": None}
+        response["trip_length"] = {
+            **{f"p{int(p * 100)}": value for p, value in zip(TRIP_PERCENTILES, stats["percentiles"])},
+            "avg": stats["avg"],
+            "max": stats["max"],
+        }
+    return response
+
+
+async def fleet_analytics(metrics: list, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                          user_email: Optional[str] = None, granularity: str = "day", top: int = 10) -> dict:
+    """
+    Every requested metric in one $facet round-trip, cached for
+    ANALYTICS_CACHE_TTL seconds per parameter set.
+    """
+    key = (tuple(sorted(metrics)), date_from, date_to, user_email, granularity, top)
+    cached = analytics_cache.get(key)
+    if cached is not None:
+        return cached
+
+    pipeline = build_pipeline(metrics, date_from, date_to, user_email, granularity, top)
+    cursor = travels_reporting_collection.aggregate(pipeline, allowDiskUse=True, maxTimeMS=ANALYTICS_MAX_TIME_MS)
+    results = await cursor.to_list(1)
+
+    response = {
+        "range": {"date_from": date_from, "date_to": date_to, "user_email": user_email},
+        **_shape(results[0], metrics),
+    }
+    if "trend" in metrics:
+        response["granularity"] = granularity
+    analytics_cache.set(key, response)
+    return response
@@ -1,20 +1,45 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError, ExpiredSignatureError
-import os
-from dotenv import load_dotenv
+import hashlib
+from app.config import env_int, env_float, JWT_SECRET as SECRET_KEY, JWT_ALGORITHM as ALGORITHM
+from app.cache import TTLCache
+from app.metrics import register_cache
 
-load_dotenv()
-
-SECRET_KEY = os.getenv("JWT_SECRET", "supersecret")
-ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# Verified-token cache: repeat requests with the same token skip signature checks
+TOKEN_CACHE_SIZE = env_int("TOKEN_CACHE_SIZE", 10000)
+TOKEN_CACHE_TTL = env_float("TOKEN_CACHE_TTL", 300)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
 
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+register_cache("token", token_cache)
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_token(token: str) -> dict:
+    """
+    Decode and verify a JWT, reusing the result of a previous verification
+    of the same token. Cached entries never outlive the token's `exp`.
+    """
+    key = _token_digest(token)
+    payload = token_cache.get(key)
+    if payload is not None:
+        return dict(payload)
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        token_cache.set(key, payload, expires_at=exp)
+    return dict(payload)
+
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        return decode_token(token)
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except JWTError:
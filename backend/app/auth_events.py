@@ -0,0 +1,219 @@
+import os
+import asyncio
+import hashlib
+import logging
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+from pymongo.errors import CollectionInvalid
+from app.config import env, env_int, env_float
+from app.database import db, auth_events_collection
+from app.metrics import registry
+from app.responses import dumps
+
+# ---------------------------------------------------------------------
+# 🛡️ Auth event log config
+# ---------------------------------------------------------------------
+# Where flushed events go: "mongo", "file" or both (comma-separated); empty keeps them in memory only
+AUTH_EVENTS_SINKS = {s.strip() for s in (env("AUTH_EVENTS_SINKS", "mongo") or "").split(",") if s.strip()}
+# Events waiting for the flusher; when full the oldest are overwritten and counted as dropped
+AUTH_EVENTS_BUFFER_SIZE = env_int("AUTH_EVENTS_BUFFER_SIZE", 10000)
+AUTH_EVENTS_BATCH_SIZE = env_int("AUTH_EVENTS_BATCH_SIZE", 500)
+AUTH_EVENTS_FLUSH_INTERVAL = env_float("AUTH_EVENTS_FLUSH_INTERVAL", 1)
+# Size of the capped auth_events collection; MongoDB discards the oldest events past it
+AUTH_EVENTS_CAPPED_BYTES = env_int("AUTH_EVENTS_CAPPED_BYTES", 64 * 1024 * 1024)
+AUTH_EVENTS_FILE = env("AUTH_EVENTS_FILE", "logs/auth_events.jsonl")
+AUTH_EVENTS_FILE_MAX_BYTES = env_int("AUTH_EVENTS_FILE_MAX_BYTES", 10 * 1024 * 1024)
+AUTH_EVENTS_FILE_BACKUPS = env_int("AUTH_EVENTS_FILE_BACKUPS", 5)
+# Failures kept in memory for the admin query when MongoDB is not a sink
+AUTH_EVENTS_RECENT_FAILURES = env_int("AUTH_EVENTS_RECENT_FAILURES", 1000)
+
+# Replaced by a short fingerprint, so events can be correlated without exposing the value
+SECRET_FIELDS = {
+    "access_token", "refresh_token", "id_token", "code", "client_secret",
+    "password", "token", "authorization", "session_id",
+}
+MAX_FIELD_LENGTH = 500
+
+AUTH_EVENTS = registry.counter("auth_events_total", "Auth events recorded", ["event", "outcome"])
+AUTH_EVENTS_DROPPED = registry.counter("auth_events_dropped_total", "Auth events overwritten before they were flushed")
+AUTH_EVENTS_WRITE_FAILURES = registry.counter("auth_events_write_failures_total", "Auth event batches a sink failed to store", ["sink"])
+
+
+def fingerprint(value) -> Optional[str]:
+    if not value:
+        return value
+    return "sha256:" + hashlib.sha256(str(value).encode()).hexdigest()[:12]
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {k: fingerprint(v) if k.lower() in SECRET_FIELDS else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str) and len(value) > MAX_FIELD_LENGTH:
+        return value[:MAX_FIELD_LENGTH] + "…"
+    return value
+
+
+class AuthEventLog:
+    """
+    Write-behind log of authentication events. `record` only appends a
+    redacted dict to a bounded ring buffer, so the auth path never waits
+    on I/O; a background task drains it in batches into the capped
+    auth_events collection and/or a rotating JSONL file. If the sinks
+    cannot keep up, the oldest unflushed events are overwritten and
+    counted in auth_events_dropped_total.
+    """
+
+    def __init__(self):
+        self.buffer = deque(maxlen=AUTH_EVENTS_BUFFER_SIZE)
+        self.failures = deque(maxlen=AUTH_EVENTS_RECENT_FAILURES)
+        self.dropped = 0
+        self.flushed = 0
+        self._wake = asyncio.Event()
+        self._task = None
+        self._file_logger = None
+
+    # -------------------------
+    # Hot path
+    # -------------------------
+    def record(self, event: str, outcome: str, **fields):
+        entry = {"ts": datetime.utcnow(), "event": event, "outcome": outcome, **redact(fields)}
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+            AUTH_EVENTS_DROPPED.inc()
+        self.buffer.append(entry)
+        if outcome == "failure":
+            self.failures.append(entry)
+        AUTH_EVENTS.inc(event, outcome)
+        if len(self.buffer) >= AUTH_EVENTS_BATCH_SIZE:
+            self._wake.set()
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    async def setup(self):
+        """Create the capped collection; must run before the indexes are built."""
+        if "mongo" not in AUTH_EVENTS_SINKS:
+            return
+        try:
+            await db.create_collection(auth_events_collection.name, capped=True, size=AUTH_EVENTS_CAPPED_BYTES)
+        except CollectionInvalid:
+            pass  # Already exists
+        except Exception as e:
+            print("⚠️ Could not create capped auth_events collection:", e)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._file_logger is not None:
+            for handler in self._file_logger.handlers:
+                handler.close()
+
+    # -------------------------
+    # Flusher
+    # -------------------------
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), AUTH_EVENTS_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        while self.buffer:
+            batch = [self.buffer.popleft() for _ in range(min(len(self.buffer), AUTH_EVENTS_BATCH_SIZE))]
+            await self._write(batch)
+
+    async def _write(self, batch: list):
+        if "file" in AUTH_EVENTS_SINKS:
+            # Serialized before insert_many adds _id to the documents
+            lines = [dumps(entry).decode() for entry in batch]
+            try:
+                await asyncio.to_thread(self._write_file, lines)
+            except Exception as e:
+                AUTH_EVENTS_WRITE_FAILURES.inc("file")
+                print(f"⚠️ Could not write {len(batch)} auth events to {AUTH_EVENTS_FILE}:", e)
+        if "mongo" in AUTH_EVENTS_SINKS:
+            try:
+                await auth_events_collection.insert_many(batch, ordered=False)
+            except Exception as e:
+                AUTH_EVENTS_WRITE_FAILURES.inc("mongo")
+                print(f"⚠️ Could not store {len(batch)} auth events:", e)
+        self.flushed += len(batch)
+
+    def _write_file(self, lines: list):
+        # Runs in a worker thread; RotatingFileHandler serializes writes and rotation
+        if self._file_logger is None:
+            os.makedirs(os.path.dirname(AUTH_EVENTS_FILE) or ".", exist_ok=True)
+            handler = RotatingFileHandler(AUTH_EVENTS_FILE, maxBytes=AUTH_EVENTS_FILE_MAX_BYTES, backupCount=AUTH_EVENTS_FILE_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("fueltrackr.auth_events")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(handler)
+            self._file_logger = logger
+        for line in lines:
+            self._file_logger.info(line)
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    async def recent_failures(
+        self, since: Optional[datetime] = None, email: Optional[str] = None, event: Optional[str] = None, limit: int = 100,
+    ) -> list:
+        """
+        Newest failures first. Served from the collection when MongoDB is a
+        sink (events reach it within AUTH_EVENTS_FLUSH_INTERVAL), otherwise
+        from this worker's in-memory window.
+        """
+        if "mongo" in AUTH_EVENTS_SINKS:
+            query = {"outcome": "failure"}
+            if since:
+                query["ts"] = {"$gte": since}
+            if email:
+                query["email"] = email
+            if event:
+                query["event"] = event
+            return await auth_events_collection.find(query, {"_id": 0}).sort("ts", -1).to_list(limit)
+
+        matches = []
+        for entry in reversed(self.failures):
+            if since and entry["ts"] < since:
+                break
+            if (email and entry.get("email") != email) or (event and entry["event"] != event):
+                continue
+            matches.append(entry)
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "sinks": sorted(AUTH_EVENTS_SINKS),
+            "buffered": len(self.buffer),
+            "capacity": self.buffer.maxlen,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+        }
+
+
+auth_events = AuthEventLog()
+
+
+registry.gauge("auth_events_buffered", "Auth events waiting to be flushed", function=lambda: {(): len(auth_events.buffer)})
@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire after a per-entry TTL.
+    Not thread-safe; meant to be used from the event loop only.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None, expires_at: float = None):
+        """
+        Store a value. The entry expires after `ttl` seconds (defaults to the
+        cache TTL) or at the absolute `expires_at` timestamp, whichever is sooner.
+        """
+        deadline = time.time() + (self.ttl if ttl is None else ttl)
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        if deadline <= time.time():
+            return
+
+        self._data[key] = (value, deadline)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
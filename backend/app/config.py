@@ -0,0 +1,38 @@
+import os
+from dotenv import load_dotenv
+
+# ---------------------------------------------------------------------
+# ⚙️ Environment: .env is read once, here, before any module reads it
+# ---------------------------------------------------------------------
+load_dotenv()
+
+_TRUE = ("1", "true", "yes")
+
+
+def env(name: str, default: str = None) -> str:
+    return os.getenv(name, default)
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return value.lower() in _TRUE if value else default
+
+# -------------------------
+# Shared settings
+# -------------------------
+MONGO_URL = env("MONGO_URL")
+DB_NAME = env("DB_NAME", "fueltrackr")
+
+JWT_SECRET = env("JWT_SECRET", "supersecret")
+JWT_ALGORITHM = env("JWT_ALGORITHM", "HS256")
+RESET_SECRET = env("RESET_SECRET", "resetsecret")
@@ -1,15 +1,103 @@
 import motor.motor_asyncio
-import os
-from dotenv import load_dotenv
+from pymongo import ReadPreference
+from app.config import env, env_int, env_float, MONGO_URL, DB_NAME
+from app.metrics import MongoCommandListener, mongo_pool_listener
 
-load_dotenv()
+# ---------------------------------------------------------------------
+# ⚙️ Motor client tuning (unset values keep the driver defaults)
+# ---------------------------------------------------------------------
+MONGO_MAX_POOL_SIZE = env_int("MONGO_MAX_POOL_SIZE", 100)
+MONGO_MIN_POOL_SIZE = env_int("MONGO_MIN_POOL_SIZE", 0)
+# Compressors need their packages installed: zstd -> zstandard, snappy -> python-snappy
+MONGO_COMPRESSORS = env("MONGO_COMPRESSORS", "")
+# Read preference for reporting endpoints (exports, summaries, analytics)
+MONGO_REPORTING_READ_PREFERENCE = env("MONGO_REPORTING_READ_PREFERENCE", "secondaryPreferred")
+# /health reports "degraded" when this many operations have been queueing for a
+# connection for MONGO_POOL_WAITING_SECONDS without a break...
+MONGO_POOL_WAITING_THRESHOLD = env_int("MONGO_POOL_WAITING_THRESHOLD", 10)
+MONGO_POOL_WAITING_SECONDS = env_float("MONGO_POOL_WAITING_SECONDS", 5)
+# ...or when the slowest 10% of checkouts in the last window waited longer than this
+MONGO_POOL_CHECKOUT_WAIT_LIMIT_MS = env_float("MONGO_POOL_CHECKOUT_WAIT_LIMIT_MS", 100)
+MONGO_POOL_HEALTH_WINDOW = env_float("MONGO_POOL_HEALTH_WINDOW", 30)
 
-MONGO_URL = os.getenv("MONGO_URL")
-DB_NAME = os.getenv("DB_NAME", "fueltrackr")
+_OPTIONAL_INT_OPTIONS = {
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "maxConnecting": "MONGO_MAX_CONNECTING",
+}
 
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "event_listeners": [MongoCommandListener(), mongo_pool_listener],
+    }
+    for option, name in _OPTIONAL_INT_OPTIONS.items():
+        value = env(name)
+        if value:
+            options[option] = int(value)
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL, **client_options())
 db = client[DB_NAME]
 
+# Secondary-friendly handle for reporting queries
+reporting_db = client.get_database(DB_NAME, read_preference=READ_PREFERENCES[MONGO_REPORTING_READ_PREFERENCE])
+
 # Collections
 users_collection = db["users"]
 travels_collection = db["travels"]
+rollups_collection = db["travel_rollups"]
+idempotency_keys_collection = db["idempotency_keys"]
+sessions_collection = db["sessions"]
+odometers_collection = db["odometers"]
+odometer_findings_collection = db["odometer_findings"]
+odometer_audits_collection = db["odometer_audits"]
+auth_events_collection = db["auth_events"]
+
+# Reporting collections (may read from secondaries)
+travels_reporting_collection = reporting_db["travels"]
+rollups_reporting_collection = reporting_db["travel_rollups"]
+
+
+def pool_health() -> dict:
+    """
+    Connection pool usage per server, with saturation relative to
+    maxPoolSize and whether the pool is degraded: nearly exhausted,
+    queueing persistently, or making checkouts wait too long.
+    """
+    pressure = mongo_pool_listener.pressure(MONGO_POOL_HEALTH_WINDOW)
+    servers = {}
+    for address, pool in mongo_pool_listener.stats().items():
+        saturation = round(pool["checked_out"] / MONGO_MAX_POOL_SIZE, 3) if MONGO_MAX_POOL_SIZE else 0.0
+        waiting_for = pressure.get(address, {}).get("waiting_for", 0.0)
+        waits = sorted(pressure.get(address, {}).get("checkout_waits", []))
+        checkout_wait_p90_ms = round(waits[int(len(waits) * 0.9)] * 1000, 3) if waits else 0.0
+        servers[address] = {
+            **pool,
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "saturation": saturation,
+            "waiting_for_s": round(waiting_for, 3),
+            "checkout_wait_p90_ms": checkout_wait_p90_ms,
+            "degraded": (
+                saturation >= 0.9
+                or (pool["waiting"] >= MONGO_POOL_WAITING_THRESHOLD and waiting_for >= MONGO_POOL_WAITING_SECONDS)
+                or checkout_wait_p90_ms > MONGO_POOL_CHECKOUT_WAIT_LIMIT_MS
+            ),
+        }
+    return servers
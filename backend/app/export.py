@@ -0,0 +1,158 @@
+import io
+import re
+import csv
+import zlib
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+# ---------------------------------------------------------------------
+# 📤 Streaming CSV / XLSX writers for travel-log exports
+# ---------------------------------------------------------------------
+# Every writer consumes an async iterator of documents (normally a Motor
+# cursor) and yields byte chunks, so memory stays flat however many rows
+# are exported.
+
+EXPORT_COLUMNS = [
+    "user_email", "date", "meter_start", "meter_end",
+    "official_km", "private_km", "total_km", "remarks", "created_at",
+]
+CHUNK_SIZE = 64 * 1024
+
+# Cells starting with these are evaluated as formulas by spreadsheet apps
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def iter_csv(documents, columns=EXPORT_COLUMNS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for doc in documents:
+        writer.writerow([_cell(doc.get(column)) for column in columns])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def gzip_stream(chunks, level: int = 6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# -------------------------
+# Minimal streaming XLSX
+# -------------------------
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Travel logs" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Non-seekable file object that collects whatever zipfile writes so it
+    can be handed to the response in chunks.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+def _xlsx_row(values) -> str:
+    cells = []
+    for value in values:
+        if value is None:
+            cells.append("<c/>")
+            continue
+        value = _cell(value)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            text = _ILLEGAL_XML_CHARS.sub("", str(value))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>')
+        else:
+            cells.append(f"<c><v>{value}</v></c>")
+    return "<row>" + "".join(cells) + "</row>"
+
+
+async def iter_xlsx(documents, columns=EXPORT_COLUMNS):
+    """
+    Stream a single-sheet workbook. Strings are written inline (no shared
+    string table) and the zip is written without seeking, so nothing but
+    the current chunk is held in memory.
+    """
+    import zipfile  # only xlsx exports need it; kept off the startup path
+
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        workbook.writestr("_rels/.rels", _ROOT_RELS)
+        workbook.writestr("xl/workbook.xml", _WORKBOOK)
+        workbook.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((_SHEET_START + _xlsx_row(columns)).encode())
+            async for doc in documents:
+                sheet.write(_xlsx_row([doc.get(column) for column in columns]).encode())
+                if sink.size >= CHUNK_SIZE:
+                    yield sink.drain()
+            sheet.write(_SHEET_END.encode())
+    yield sink.drain()
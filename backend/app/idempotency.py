@@ -0,0 +1,116 @@
+import time
+import asyncio
+import hashlib
+import orjson
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from app.config import env_int, env_float
+from app.database import idempotency_keys_collection
+from app.metrics import registry
+
+# ---------------------------------------------------------------------
+# 🔁 Idempotency-Key config
+# ---------------------------------------------------------------------
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# How long a completed response is replayed for retried submissions
+IDEMPOTENCY_TTL_SECONDS = env_int("IDEMPOTENCY_TTL_SECONDS", 86400)
+# How long a duplicate waits for the in-flight original before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = env_float("IDEMPOTENCY_WAIT_SECONDS", 5)
+# A claim still pending after this long belongs to a crashed worker and may be taken over
+IDEMPOTENCY_PENDING_TIMEOUT = env_int("IDEMPOTENCY_PENDING_TIMEOUT", 30)
+
+IDEMPOTENCY_REQUESTS = registry.counter(
+    "idempotency_requests_total", "Requests carrying an Idempotency-Key", ["outcome"]
+)
+
+
+def request_fingerprint(payload: dict) -> str:
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Shared key store: the unique `_id` (user|key) makes the claim atomic
+    across workers and a TTL index on `expires_at` forgets old keys. The
+    first request to claim a key processes it; duplicates wait for the
+    stored response and replay it.
+    """
+
+    def __init__(self, collection, ttl: int = IDEMPOTENCY_TTL_SECONDS):
+        self.collection = collection
+        self.ttl = ttl
+
+    @staticmethod
+    def _id(user_email: str, key: str) -> str:
+        return f"{user_email}|{key}"
+
+    async def claim(self, user_email: str, key: str, fingerprint: str) -> Optional[dict]:
+        """
+        Return None if this request now owns the key, or the response
+        stored by the request that did. Raises 422 when the key was used
+        with a different payload and 409 if the original is still running.
+        """
+        _id = self._id(user_email, key)
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.02
+
+        while True:
+            now = datetime.utcnow()
+            try:
+                await self.collection.insert_one({
+                    "_id": _id,
+                    "fingerprint": fingerprint,
+                    "status": "pending",
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                })
+                IDEMPOTENCY_REQUESTS.inc("new")
+                return None
+            except DuplicateKeyError:
+                pass
+
+            existing = await self.collection.find_one({"_id": _id})
+            if existing is None:
+                continue  # expired or released in between; claim again
+
+            if existing["fingerprint"] != fingerprint:
+                IDEMPOTENCY_REQUESTS.inc("mismatch")
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used with a different request",
+                )
+            if existing["status"] == "done":
+                IDEMPOTENCY_REQUESTS.inc("replayed")
+                return existing["response"]
+
+            if existing["created_at"] < now - timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT):
+                # Abandoned claim: drop it and race for it again
+                await self.collection.delete_one({"_id": _id, "status": "pending", "created_at": existing["created_at"]})
+                continue
+
+            if time.monotonic() >= deadline:
+                IDEMPOTENCY_REQUESTS.inc("in_progress")
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still being processed",
+                    headers={"Retry-After": "1"},
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def complete(self, user_email: str, key: str, response: dict):
+        await self.collection.update_one(
+            {"_id": self._id(user_email, key)},
+            {"$set": {"status": "done", "response": response}},
+        )
+
+    async def release(self, user_email: str, key: str):
+        # Let the client retry after a failure instead of waiting for the TTL
+        await self.collection.delete_one({"_id": self._id(user_email, key), "status": "pending"})
+
+
+idempotency_store = IdempotencyStore(idempotency_keys_collection)
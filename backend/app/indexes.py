@@ -0,0 +1,134 @@
+import sys
+import asyncio
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.config import env_bool
+from app.database import (
+    users_collection, travels_collection, rollups_collection,
+    idempotency_keys_collection, sessions_collection, odometer_findings_collection,
+    auth_events_collection,
+)
+
+VERIFY_QUERY_PLANS = env_bool("VERIFY_QUERY_PLANS", False)
+
+# ---------------------------------------------------------------------
+# 📇 Declared indexes (created idempotently at startup)
+# ---------------------------------------------------------------------
+INDEXES = [
+    (users_collection, [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ]),
+    (travels_collection, [
+        IndexModel([("user_email", ASCENDING), ("created_at", ASCENDING)], name="user_email_created_at"),
+        IndexModel([("date", ASCENDING)], name="date"),
+        # Keyset pagination order for the admin listings
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+        # Last line of defence against duplicate retried submissions
+        IndexModel(
+            [("user_email", ASCENDING), ("idempotency_key", ASCENDING)],
+            name="user_email_idempotency_key_unique",
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$exists": True}},
+        ),
+    ]),
+    (rollups_collection, [
+        IndexModel([("month", ASCENDING), ("user_email", ASCENDING)], name="month_user_email"),
+        IndexModel([("user_email", ASCENDING), ("month", ASCENDING)], name="user_email_month"),
+    ]),
+    (idempotency_keys_collection, [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]),
+    (sessions_collection, [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]),
+    (odometer_findings_collection, [
+        IndexModel([("run_id", ASCENDING), ("user_email", ASCENDING), ("created_at", ASCENDING)], name="run_id_user_email_created_at"),
+    ]),
+    # Recent login failures, overall and per user (the collection itself is capped)
+    (auth_events_collection, [
+        IndexModel([("outcome", ASCENDING), ("ts", DESCENDING)], name="outcome_ts"),
+        IndexModel([("email", ASCENDING), ("ts", DESCENDING)], name="email_ts"),
+    ]),
+]
+
+# ---------------------------------------------------------------------
+# 🔥 Hot queries that must never fall back to a collection scan
+# ---------------------------------------------------------------------
+HOT_QUERIES = [
+    ("users.find_one(email)", users_collection, {"email": "probe@example.com"}, None),
+    ("travels.find(user_email)", travels_collection, {"user_email": "probe@example.com"}, None),
+    ("travels.find(date range)", travels_collection, {"date": {"$gte": "2000-01-01", "$lte": "2000-01-31"}}, None),
+    ("travels.find().sort(created_at, _id)", travels_collection, {}, [("created_at", ASCENDING), ("_id", ASCENDING)]),
+    # Odometer audit scan
+    ("travels.find().sort(user_email, created_at)", travels_collection, {}, [("user_email", ASCENDING), ("created_at", ASCENDING)]),
+    # Analytics $match stages
+    ("travels.find(user_email, created_at range)", travels_collection,
+     {"user_email": "probe@example.com", "created_at": {"$gte": datetime(2000, 1, 1), "$lt": datetime(2000, 2, 1)}}, None),
+    ("travels.find(created_at range)", travels_collection,
+     {"created_at": {"$gte": datetime(2000, 1, 1), "$lt": datetime(2000, 2, 1)}}, None),
+    # Admin query of recent login failures
+    ("auth_events.find(outcome).sort(ts)", auth_events_collection, {"outcome": "failure"}, [("ts", DESCENDING)]),
+]
+
+
+async def ensure_indexes(raise_errors: bool = False):
+    """
+    Create every declared index. create_indexes is a no-op for indexes
+    that already exist with the same spec, so this is safe on every boot.
+    """
+    for collection, models in INDEXES:
+        try:
+            names = await collection.create_indexes(models)
+            print(f"📇 Indexes ready on {collection.name}:", ", ".join(names))
+        except OperationFailure as e:
+            print(f"❌ Index creation failed on {collection.name}:", e)
+            if raise_errors:
+                raise
+
+
+def _plan_stages(plan) -> set:
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= _plan_stages(item)
+    return stages
+
+
+async def verify_query_plans() -> list:
+    """
+    Run explain() on each hot query and return the ones whose winning plan
+    contains a COLLSCAN stage.
+    """
+    failures = []
+    for label, collection, query, sort in HOT_QUERIES:
+        cursor = collection.find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        status = "❌ COLLSCAN" if "COLLSCAN" in stages else "✅ " + ", ".join(sorted(stages))
+        print(f"🔎 {label}: {status}")
+        if "COLLSCAN" in stages:
+            failures.append(label)
+    return failures
+
+
+async def _main(verify: bool) -> int:
+    await ensure_indexes(raise_errors=True)
+    if verify:
+        failures = await verify_query_plans()
+        if failures:
+            print("❌ Queries falling back to COLLSCAN:", ", ".join(failures))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m app.indexes [--verify]
+    sys.exit(asyncio.run(_main("--verify" in sys.argv[1:])))
@@ -0,0 +1,119 @@
+import csv
+import json
+import codecs
+from fastapi import HTTPException, Request
+from app.config import env_int
+
+BULK_BATCH_SIZE = env_int("TRAVEL_BULK_BATCH_SIZE", 500)
+BULK_MAX_BATCH_SIZE = env_int("TRAVEL_BULK_MAX_BATCH_SIZE", 5000)
+BULK_MAX_ERRORS = env_int("TRAVEL_BULK_MAX_ERRORS", 1000)
+
+JSON_TYPES = ("application/json",)
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_TYPES = ("text/csv", "application/csv")
+
+# -------------------------
+# Streaming row readers
+# -------------------------
+async def _iter_lines(request: Request):
+    """
+    Yield decoded lines from the request body as it arrives, without
+    buffering the whole upload.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_rows(request: Request):
+    """
+    Yield (row_number, row, error) for a JSON array, NDJSON or CSV upload.
+    Row numbers are 1-based; for CSV they exclude the header line. CSV
+    fields must not contain embedded newlines.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in JSON_TYPES:
+        try:
+            rows = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body is not valid JSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of travel logs")
+        for number, row in enumerate(rows, start=1):
+            if isinstance(row, dict):
+                yield number, row, None
+            else:
+                yield number, None, "Row must be a JSON object"
+
+    elif content_type in NDJSON_TYPES:
+        number = 0
+        async for line in _iter_lines(request):
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield number, None, "Invalid JSON"
+                continue
+            if isinstance(row, dict):
+                yield number, row, None
+            else:
+                yield number, None, "Row must be a JSON object"
+
+    elif content_type in CSV_TYPES:
+        header = None
+        number = 0
+        async for line in _iter_lines(request):
+            if not line.strip():
+                continue
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            number += 1
+            if len(values) != len(header):
+                yield number, None, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            # Empty cells fall back to the schema defaults
+            yield number, {k: v for k, v in zip(header, values) if v != ""}, None
+
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Use application/json, application/x-ndjson or text/csv",
+        )
+
+
+def format_validation_error(error) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+
+class RowErrors:
+    """
+    Row errors of one bulk upload: the first BULK_MAX_ERRORS are kept for
+    the response, later ones are only counted.
+    """
+
+    def __init__(self, limit: int = BULK_MAX_ERRORS):
+        self.limit = limit
+        self.items = []
+        self.count = 0
+
+    def add(self, row: int, error: str):
+        self.count += 1
+        if len(self.items) < self.limit:
+            self.items.append({"row": row, "error": error})
+
+    def report(self) -> list:
+        return sorted(self.items, key=lambda e: e["row"])
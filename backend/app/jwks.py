@@ -0,0 +1,143 @@
+import time
+import asyncio
+from jose import jwt, JWTError
+from app.config import env, env_int, env_float
+from app.wso2_oidc import CLIENT_ID, get_jwks
+
+# ---------------------------------------------------------------------
+# 🔑 ID token validation config
+# ---------------------------------------------------------------------
+ISSUER = env("WSO2_ISSUER", "https://localhost:9443/oauth2/token")
+REFRESH_INTERVAL = env_float("JWKS_REFRESH_INTERVAL", 3600)
+MIN_REFETCH_INTERVAL = env_float("JWKS_MIN_REFETCH_INTERVAL", 30)
+CLOCK_LEEWAY = env_int("ID_TOKEN_LEEWAY", 30)
+# Accepted signing algorithms; never taken from the token header
+ID_TOKEN_ALGORITHMS = [a.strip() for a in env("ID_TOKEN_ALGORITHMS", "RS256").split(",") if a.strip()]
+
+# Claims the callback needs; userinfo is only called when one is missing
+REQUIRED_CLAIMS = [c.strip() for c in env("WSO2_REQUIRED_CLAIMS", "sub,email").split(",") if c.strip()]
+
+# Protocol claims that are not part of the user profile
+PROTOCOL_CLAIMS = {
+    "iss", "aud", "azp", "exp", "iat", "nbf", "jti", "nonce", "auth_time",
+    "at_hash", "c_hash", "s_hash", "amr", "acr", "sid", "isk",
+}
+
+
+class JWKSCache:
+    """
+    In-memory copy of WSO2's signing keys, indexed by `kid`.
+
+    Keys are fetched once, refreshed periodically by a background task and
+    re-fetched on demand when a token references an unknown `kid`. On-demand
+    re-fetches are rate limited so forged `kid` values cannot hammer WSO2,
+    and so is retrying while WSO2's JWKS is down: until the next attempt is
+    allowed, lookups of unknown keys fail with the last fetch error.
+    """
+
+    def __init__(self, refresh_interval: float = REFRESH_INTERVAL, min_refetch_interval: float = MIN_REFETCH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self._keys = {}
+        self._attempted_at = None
+        self._error = None
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def _fetch(self):
+        self._attempted_at = time.monotonic()
+        try:
+            jwks = await get_jwks()
+        except Exception as e:
+            self._error = e
+            raise
+        self._keys = {key.get("kid"): key for key in jwks.get("keys", [])}
+        self._error = None
+
+    def _may_refetch(self) -> bool:
+        return self._attempted_at is None or time.monotonic() - self._attempted_at >= self.min_refetch_interval
+
+    async def refresh(self):
+        async with self._lock:
+            await self._fetch()
+
+    async def get_key(self, kid):
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        # 🔁 Unknown kid: WSO2 may have rotated keys
+        # Also wait out a fetch already in flight rather than judge by the state before it
+        if self._may_refetch() or self._lock.locked():
+            async with self._lock:
+                # Checked again: requests queued here are served by the first one's fetch
+                if kid not in self._keys and self._may_refetch():
+                    await self._fetch()
+        if self._error is not None and kid not in self._keys:
+            # The last fetch failed; callers fall back as if they had made it
+            raise RuntimeError(f"JWKS unavailable: {self._error}")
+        key = self._keys.get(kid)
+
+        # Tokens without a kid are accepted only when there is a single key
+        if key is None and kid is None and len(self._keys) == 1:
+            key = next(iter(self._keys.values()))
+        return key
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+                delay = self.refresh_interval
+            except Exception as e:
+                print("⚠️ JWKS refresh failed:", e)
+                delay = min(self.refresh_interval, self.min_refetch_interval)
+            await asyncio.sleep(delay)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+jwks_cache = JWKSCache()
+
+# ---------------------------------------------------------------------
+# 🧾 Verify ID token locally
+# ---------------------------------------------------------------------
+async def verify_id_token(id_token: str, access_token: str = None) -> dict:
+    """
+    Verify the ID token signature, issuer, audience and expiry against the
+    cached JWKS and return its claims. Raises JWTError if the token is invalid.
+    """
+    header = jwt.get_unverified_header(id_token)
+    key = await jwks_cache.get_key(header.get("kid"))
+    if key is None:
+        raise JWTError("No matching signing key for ID token")
+    if key.get("alg") and key["alg"] not in ID_TOKEN_ALGORITHMS:
+        raise JWTError(f"Signing key algorithm {key['alg']} is not allowed")
+
+    return jwt.decode(
+        id_token,
+        key,
+        algorithms=[key["alg"]] if key.get("alg") else ID_TOKEN_ALGORITHMS,
+        audience=CLIENT_ID,
+        issuer=ISSUER,
+        access_token=access_token,
+        options={"leeway": CLOCK_LEEWAY},
+    )
+
+
+def user_claims(claims: dict) -> dict:
+    return {k: v for k, v in claims.items() if k not in PROTOCOL_CLAIMS}
+
+
+def missing_claims(claims: dict) -> list:
+    return [c for c in REQUIRED_CLAIMS if c not in claims]
@@ -0,0 +1,243 @@
+import asyncio
+from collections import deque
+from typing import Optional
+from pymongo.errors import OperationFailure, PyMongoError
+from app.config import env_int, env_float
+from app.database import travels_collection
+from app.metrics import registry
+from app.responses import dumps
+
+# ---------------------------------------------------------------------
+# 📡 Live travel-log feed (change stream -> Server-Sent Events)
+# ---------------------------------------------------------------------
+# Recent events kept in memory so reconnecting clients resume without a new stream
+LIVE_FEED_BUFFER = env_int("LIVE_FEED_BUFFER", 1000)
+# Events queued per subscriber; a client that falls further behind is told to reload
+LIVE_FEED_QUEUE_SIZE = env_int("LIVE_FEED_QUEUE_SIZE", 1000)
+LIVE_FEED_MAX_SUBSCRIBERS = env_int("LIVE_FEED_MAX_SUBSCRIBERS", 200)
+# Comment lines sent on idle connections so proxies keep them open
+LIVE_FEED_HEARTBEAT = env_float("LIVE_FEED_HEARTBEAT", 15)
+LIVE_FEED_RETRY_DELAY = env_float("LIVE_FEED_RETRY_DELAY", 2)
+
+PIPELINE = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+
+# Change streams need a replica set (or sharded cluster)
+_NOT_REPLICA_SET = 40573
+_HISTORY_LOST = 286
+
+LIVE_FEED_EVENTS = registry.counter("live_feed_events_total", "Change events fanned out to SSE subscribers", ["op"])
+LIVE_FEED_DROPPED = registry.counter("live_feed_dropped_total", "Subscribers dropped for falling behind")
+
+HEARTBEAT = b": heartbeat\n\n"
+RESET = b"event: reset\ndata: {}\n\n"
+
+
+def _event(change: dict) -> tuple:
+    # The resume token doubles as the SSE event id, so Last-Event-ID can resume the stream
+    event_id = change["_id"]["_data"]
+    op = "insert" if change["operationType"] == "insert" else "update"
+    data = dumps({"op": op, "log": change.get("fullDocument")}).decode()
+    return event_id, f"id: {event_id}\nevent: {op}\ndata: {data}\n\n".encode(), op
+
+
+class _Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=LIVE_FEED_QUEUE_SIZE)
+        self.dropped = False
+
+
+class ChangeFeed:
+    """
+    One change stream per worker, fanned out to every SSE subscriber, so
+    the database sees a single cursor however many admins are watching.
+    Events carry their resume token as id: a reconnecting client is
+    replayed from the in-memory buffer. A token older than the buffer
+    (e.g. after a restart, or from another worker) is caught up on a
+    short-lived private stream until it reaches an event in the buffer,
+    then handed over to the shared stream; if it cannot get there, the
+    client is told to reload.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.subscribers = set()
+        self.catching_up = 0
+        self.buffer = deque(maxlen=LIVE_FEED_BUFFER)
+        self.error = None
+        self._resume_token = None
+        self._task = None
+
+    # -------------------------
+    # Shared stream
+    # -------------------------
+    def _publish(self, change: dict):
+        event_id, chunk, op = _event(change)
+        self._resume_token = change["_id"]
+        self.buffer.append((event_id, chunk))
+        LIVE_FEED_EVENTS.inc(op)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(chunk)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+                LIVE_FEED_DROPPED.inc()
+
+    async def _run(self):
+        while True:
+            try:
+                async with self.collection.watch(
+                    PIPELINE, full_document="updateLookup", resume_after=self._resume_token
+                ) as stream:
+                    self.error = None
+                    async for change in stream:
+                        self._publish(change)
+            except OperationFailure as e:
+                self.error = str(e)
+                if e.code == _NOT_REPLICA_SET:
+                    print("⚠️ Live feed disabled, change streams need a replica set:", e)
+                    self._reset_subscribers()
+                    return
+                if e.code == _HISTORY_LOST:
+                    # Events were missed: start over and make clients reload
+                    self._resume_token = None
+                    self.buffer.clear()
+                    self._reset_subscribers()
+                print("⚠️ Live feed change stream failed:", e)
+            except PyMongoError as e:
+                self.error = str(e)
+                print("⚠️ Live feed change stream interrupted:", e)
+            except Exception as e:
+                self.error = str(e)
+                print("⚠️ Live feed disabled:", e)
+                return
+            await asyncio.sleep(LIVE_FEED_RETRY_DELAY)
+
+    def _drop(self, subscriber: _Subscriber):
+        subscriber.dropped = True
+        self.subscribers.discard(subscriber)
+        try:
+            subscriber.queue.put_nowait(None)  # wake it up
+        except asyncio.QueueFull:
+            pass
+
+    def _reset_subscribers(self):
+        for subscriber in list(self.subscribers):
+            self._drop(subscriber)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._reset_subscribers()
+
+    @property
+    def available(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # -------------------------
+    # Subscribers
+    # -------------------------
+    def _join(self, last_event_id: Optional[str]) -> Optional[tuple]:
+        """
+        Register a subscriber and return it with the buffered events after
+        `last_event_id`, or None if the id is not in the buffer. Replay and
+        registration happen in one step so nothing is missed or sent twice.
+        """
+        backlog = []
+        if last_event_id:
+            for position, (event_id, _) in enumerate(self.buffer):
+                if event_id == last_event_id:
+                    backlog = [chunk for _, chunk in list(self.buffer)[position + 1:]]
+                    break
+            else:
+                return None
+        subscriber = _Subscriber()
+        self.subscribers.add(subscriber)
+        return subscriber, backlog
+
+    async def _catch_up(self, last_event_id: str):
+        """
+        Events after `last_event_id` from a private resumed stream. Ends
+        when the stream is idle (caught up) or after LIVE_FEED_BUFFER
+        events, at which point a reload is cheaper than replaying.
+        """
+        try:
+            async with self.collection.watch(
+                PIPELINE, full_document="updateLookup", resume_after={"_data": last_event_id},
+                max_await_time_ms=int(LIVE_FEED_HEARTBEAT * 1000),
+            ) as stream:
+                for _ in range(LIVE_FEED_BUFFER):
+                    change = await stream.try_next()
+                    if change is None:
+                        return
+                    event_id, chunk, _ = _event(change)
+                    yield event_id, chunk
+        except PyMongoError:
+            # Unknown or expired token
+            return
+
+    @property
+    def full(self) -> bool:
+        return len(self.subscribers) + self.catching_up >= LIVE_FEED_MAX_SUBSCRIBERS
+
+    async def events(self, last_event_id: Optional[str] = None):
+        # Joined before the first chunk, so a client that loads the list once
+        # it sees that chunk cannot miss a change in between
+        joined = self._join(last_event_id)
+        try:
+            yield f"retry: {int(LIVE_FEED_RETRY_DELAY * 1000)}\n\n".encode()
+
+            if joined is None:
+                self.catching_up += 1
+                stream = self._catch_up(last_event_id)
+                try:
+                    async for event_id, chunk in stream:
+                        yield chunk
+                        joined = self._join(event_id)
+                        if joined is not None:
+                            break
+                finally:
+                    self.catching_up -= 1
+                    await stream.aclose()
+                if joined is None:
+                    yield RESET
+                    return
+
+            subscriber, backlog = joined
+            for chunk in backlog:
+                yield chunk
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(subscriber.queue.get(), LIVE_FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    chunk = HEARTBEAT
+                if subscriber.dropped:
+                    # Fell behind or the stream lost history: the client must reload
+                    yield RESET
+                    return
+                yield chunk
+        finally:
+            if joined is not None:
+                self.subscribers.discard(joined[0])
+
+    def stats(self) -> dict:
+        return {
+            "running": self.available,
+            "error": self.error,
+            "subscribers": len(self.subscribers),
+            "catching_up": self.catching_up,
+            "buffered": len(self.buffer),
+        }
+
+
+travel_feed = ChangeFeed(travels_collection)
+
+registry.gauge("live_feed_subscribers", "Connected live feed subscribers", function=lambda: {(): len(travel_feed.subscribers)})
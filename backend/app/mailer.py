@@ -0,0 +1,217 @@
+import asyncio
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from app.config import env, env_int, env_float, env_bool
+from app.database import db
+from app.metrics import registry, track_dependency
+
+# ---------------------------------------------------------------------
+# ✉️ Outbound mail config
+# ---------------------------------------------------------------------
+SMTP_SERVER = env("SMTP_SERVER", "smtp.office365.com")
+SMTP_PORT = env_int("SMTP_PORT", 587)
+SMTP_STARTTLS = env_bool("SMTP_STARTTLS", True)
+SMTP_USERNAME = env("OUTLOOK_EMAIL")
+SMTP_PASSWORD = env("OUTLOOK_PASSWORD")
+MAIL_FROM = env("MAIL_FROM", SMTP_USERNAME)
+
+MAIL_QUEUE_SIZE = env_int("MAIL_QUEUE_SIZE", 10000)
+MAIL_BATCH_SIZE = env_int("MAIL_BATCH_SIZE", 50)
+MAIL_MAX_ATTEMPTS = env_int("MAIL_MAX_ATTEMPTS", 5)
+MAIL_RETRY_BACKOFF = env_float("MAIL_RETRY_BACKOFF", 2)
+# Close the SMTP connection after this many idle seconds
+MAIL_IDLE_TIMEOUT = env_float("MAIL_IDLE_TIMEOUT", 60)
+
+dead_letters_collection = db["mail_dead_letters"]
+
+MAIL_SENT = registry.counter("mail_sent_total", "Emails delivered to the SMTP server")
+MAIL_RETRIED = registry.counter("mail_retried_total", "Email delivery attempts scheduled for retry")
+MAIL_DEAD_LETTERED = registry.counter("mail_dead_lettered_total", "Emails moved to the dead-letter store")
+
+
+class MailQueue:
+    """
+    Async outbound mail queue.
+
+    Endpoints enqueue and return immediately; a background task drains the
+    queue in batches over one persistent SMTP connection. The connection is
+    owned by a single worker thread (smtplib is blocking and not
+    thread-safe), re-opened on failure and closed when idle. Failed
+    messages are retried with exponential backoff and moved to the
+    mail_dead_letters collection after MAIL_MAX_ATTEMPTS.
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=MAIL_QUEUE_SIZE)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._smtp = None
+        self._task = None
+        self._retries = set()
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def enqueue(self, to: str, subject: str, html: str):
+        """
+        Queue a message. Raises asyncio.QueueFull when the queue is at capacity.
+        """
+        self.queue.put_nowait({"to": to, "subject": subject, "html": html, "attempts": 0})
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10):
+        """
+        Give queued messages a chance to go out, then stop the worker.
+        """
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Mail queue stopped with {self.queue.qsize()} messages undelivered")
+        self._task.cancel()
+        for retry in list(self._retries):
+            retry.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+
+    # -------------------------
+    # Worker (event loop side)
+    # -------------------------
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), MAIL_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(self._executor, self._close)
+                continue
+
+            batch = [first]
+            while len(batch) < MAIL_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            try:
+                with track_dependency("smtp", "send_batch"):
+                    failures = await loop.run_in_executor(self._executor, self._send_batch, batch)
+            except Exception as e:
+                failures = [(message, str(e)) for message in batch]
+
+            for message, error in failures:
+                await self._handle_failure(message, error)
+            for _ in batch:
+                self.queue.task_done()
+
+    async def _handle_failure(self, message: dict, error: str):
+        message["attempts"] += 1
+        if message["attempts"] >= MAIL_MAX_ATTEMPTS:
+            MAIL_DEAD_LETTERED.inc()
+            try:
+                # The body is not kept: reset emails carry a live token
+                await dead_letters_collection.insert_one({
+                    "to": message["to"],
+                    "subject": message["subject"],
+                    "attempts": message["attempts"],
+                    "error": error,
+                    "failed_at": datetime.utcnow(),
+                })
+            except Exception as e:
+                print("❌ Could not store dead-lettered email:", e)
+            return
+
+        MAIL_RETRIED.inc()
+        delay = MAIL_RETRY_BACKOFF * (2 ** (message["attempts"] - 1))
+        retry = asyncio.create_task(self._requeue_later(message, delay))
+        self._retries.add(retry)
+        retry.add_done_callback(self._retries.discard)
+
+    async def _requeue_later(self, message: dict, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            await self._handle_failure(message, "Mail queue full on retry")
+
+    # -------------------------
+    # SMTP connection (worker thread side)
+    # -------------------------
+    # smtplib and email.mime are imported here, on the worker thread, to keep
+    # them off the import path of every API process
+
+    def _connect(self):
+        import ssl
+        import smtplib
+
+        smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+        try:
+            if SMTP_STARTTLS:
+                smtp.starttls(context=ssl.create_default_context())
+            if SMTP_USERNAME and SMTP_PASSWORD:
+                smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except OSError:
+                pass
+            self._smtp = None
+
+    def _drop(self):
+        # Broken connection: no QUIT, just release the socket
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            except OSError:
+                pass
+            self._smtp = None
+
+    def _send_batch(self, batch: list) -> list:
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
+        failures = []
+        for message in batch:
+            mime = MIMEMultipart("alternative")
+            mime["Subject"] = message["subject"]
+            mime["From"] = MAIL_FROM
+            mime["To"] = message["to"]
+            mime.attach(MIMEText(message["html"], "html"))
+
+            # One reconnect per message covers connections dropped while idle
+            for attempt in range(2):
+                try:
+                    if self._smtp is None:
+                        self._connect()
+                    self._smtp.sendmail(MAIL_FROM, message["to"], mime.as_string())
+                    MAIL_SENT.inc()
+                    break
+                except smtplib.SMTPServerDisconnected as e:
+                    self._drop()
+                    if attempt == 1:
+                        failures.append((message, str(e)))
+                except smtplib.SMTPException as e:
+                    failures.append((message, str(e)))
+                    break
+                except OSError as e:
+                    # Socket-level failure: drop the connection and reconnect
+                    self._drop()
+                    if attempt == 1:
+                        failures.append((message, str(e)))
+        return failures
+
+
+mail_queue = MailQueue()
+
+registry.gauge("mail_queue_depth", "Emails waiting to be sent", function=lambda: {(): mail_queue.queue.qsize()})
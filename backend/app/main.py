@@ -1,13 +1,23 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, JSONResponse
 from app.routes import users, travels, admin
-from app.database import db
-from app.wso2_oidc import exchange_code_for_token, get_userinfo
+from app.database import db, pool_health
+from app.wso2_oidc import CLIENT_ID, exchange_code_for_token, get_userinfo, revoke_token, close_http_client
+from app.sessions import session_store, SESSION_COOKIE_NAME, SESSION_COOKIE_SECURE, SESSION_COOKIE_SAMESITE, SESSION_TTL_SECONDS
+from app.rate_limit import rate_limit, rate_limiter, client_ip
+from app.replay_store import replay_store
+from app.indexes import ensure_indexes, verify_query_plans, VERIFY_QUERY_PLANS
+from app.utils import shutdown_hash_executor
+from app.mailer import mail_queue
+from app.metrics import MetricsMiddleware, registry, CONTENT_TYPE
+from app.jwks import jwks_cache, verify_id_token, user_claims, missing_claims
+from app.warmup import warmup
+from app.live_feed import travel_feed
+from app.auth_events import auth_events
+from jose import JWTError
 import ssl
-import urllib3
-
-# Disable SSL warnings for self-signed certs (WSO2 default)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+import time
 
 app = FastAPI(title="FuelTrackr API")
 
@@ -24,8 +34,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Content-Disposition", "Idempotent-Replayed"],
 )
 
+# ✅ Per-route latency, status and in-flight metrics
+app.add_middleware(MetricsMiddleware)
+
 # ✅ Include Routers
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(travels.router, prefix="/api/travels", tags=["Travels"])
@@ -39,6 +53,58 @@ async def startup_db_client():
         print("✅ MongoDB connection established successfully")
     except Exception as e:
         print("❌ MongoDB connection failed:", e)
+        return
+
+    await auth_events.setup()
+    await ensure_indexes()
+    await replay_store.setup()
+    await rate_limiter.setup()
+
+    # 🔎 Refuse to start if a hot query would scan the whole collection
+    if VERIFY_QUERY_PLANS and await verify_query_plans():
+        raise RuntimeError("Hot queries fall back to COLLSCAN, see query plan report above")
+
+
+# ✅ Keep WSO2 signing keys warm for local ID token validation
+@app.on_event("startup")
+async def startup_jwks_cache():
+    jwks_cache.start()
+
+
+# ✅ Shared change stream behind the admin live feed
+@app.on_event("startup")
+async def startup_live_feed():
+    travel_feed.start()
+
+
+# ✅ Write-behind flushing of auth events
+@app.on_event("startup")
+async def startup_auth_events():
+    auth_events.start()
+
+
+# ✅ Background delivery of outbound email
+@app.on_event("startup")
+async def startup_mail_queue():
+    mail_queue.start()
+
+
+# ✅ Open pooled connections and start hashing workers before /health reports ready
+@app.on_event("startup")
+async def startup_warmup():
+    warmup.start()
+
+
+# ✅ Release pooled WSO2 connections and worker pools
+@app.on_event("shutdown")
+async def shutdown_clients():
+    await warmup.stop()
+    await travel_feed.stop()
+    await jwks_cache.stop()
+    await mail_queue.stop()
+    await auth_events.stop()
+    await close_http_client()
+    shutdown_hash_executor()
 
 
 # ✅ Root endpoint
@@ -47,37 +113,98 @@ async def root():
     return {"msg": "🚀 FuelTrackr API running successfully"}
 
 
+# ✅ Health: warmup, MongoDB reachability and connection-pool saturation
+@app.get("/health")
+async def health():
+    if not warmup.ready.is_set():
+        return JSONResponse({"status": "warming_up", "warmup": warmup.status()}, status_code=503)
+
+    start = time.perf_counter()
+    try:
+        await db.command("ping")
+    except Exception as e:
+        return JSONResponse({"status": "unavailable", "mongodb": {"error": str(e)}}, status_code=503)
+    ping_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    pools = pool_health()
+    return {
+        "status": "degraded" if any(p["degraded"] for p in pools.values()) else "ok",
+        "mongodb": {"ping_ms": ping_ms, "pools": pools},
+        "warmup": warmup.status(),
+    }
+
+
+# ✅ Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
 ## ---------------------------------------------------------------------
 # 🔐 WSO2 OIDC Callback
 # ---------------------------------------------------------------------
-@app.get("/api/auth/callback")
-async def oidc_callback(code: str, request: Request):
+@app.get("/api/auth/callback", dependencies=[Depends(rate_limit("oidc_callback"))])
+async def oidc_callback(code: str, request: Request, response: Response):
     """
     Handles redirect from WSO2 IS.
     Example redirect: http://localhost:5173/callback?code=abc123
     """
+    # 🚦 Cap the total load this app puts on WSO2
+    await rate_limiter.check("oidc_callback", "client_id", CLIENT_ID)
+
+    # 🍪 Fail before the code is spent if sessions cannot be stored
+    session_store.ensure_configured()
+
+    start = time.perf_counter()
+    ip = client_ip(request)
     try:
         # 🧱 Block reuse of authorization codes
-        if code in used_codes:
+        if not await replay_store.mark_used(code):
             raise HTTPException(status_code=400, detail="Authorization code already used")
-        used_codes.add(code)
 
         # ✅ Must match exactly as in WSO2 Authorized Redirect URLs
         redirect_uri = "http://localhost:5173/callback"
 
         # 🔁 Exchange the authorization code for access & ID tokens
-        token_data = exchange_code_for_token(code, redirect_uri)
+        token_data = await exchange_code_for_token(code, redirect_uri)
 
         if "access_token" not in token_data:
             raise HTTPException(status_code=401, detail="Invalid token response from WSO2")
 
-        # 🧩 Fetch user info using access token
-        user_info = get_userinfo(token_data["access_token"])
+        # 🧾 Verify the ID token locally and use its claims as the profile
+        claims = {}
+        id_token = token_data.get("id_token")
+        if id_token:
+            try:
+                claims = await verify_id_token(id_token, token_data["access_token"])
+            except JWTError as e:
+                raise HTTPException(status_code=401, detail=f"Invalid ID token: {str(e)}")
+            except Exception as e:
+                # JWKS unreachable: fall back to the userinfo endpoint
+                auth_events.record("id_token_verification", "failure", ip=ip, error=str(e) or type(e).__name__)
+        user_info = user_claims(claims)
+
+        # 🧩 Fetch user info only when a required claim is missing
+        userinfo_fallback = bool(missing_claims(user_info))
+        if userinfo_fallback:
+            user_info.update(await get_userinfo(token_data["access_token"]))
+
+        # 🍪 Keep the tokens server-side behind an opaque session cookie
+        session_id = await session_store.create(token_data, user_info)
+        response.set_cookie(
+            SESSION_COOKIE_NAME,
+            session_id,
+            max_age=SESSION_TTL_SECONDS,
+            httponly=True,
+            secure=SESSION_COOKIE_SECURE,
+            samesite=SESSION_COOKIE_SAMESITE,
+            path="/api/auth",
+        )
 
-        # 🧠 Debug logs
-        print("✅ Token exchange successful.")
-        print("Access Token:", token_data.get("access_token")[:30], "...")
-        print("👤 User Info:", user_info)
+        auth_events.record(
+            "oidc_login", "success", email=user_info.get("email"), sub=user_info.get("sub"), ip=ip,
+            userinfo_fallback=userinfo_fallback, ms=round((time.perf_counter() - start) * 1000, 2),
+        )
 
         # ✅ Send response to frontend
         return {
@@ -88,5 +215,45 @@ async def oidc_callback(code: str, request: Request):
         }
 
     except Exception as e:
-        print("❌ OIDC callback error:", e)
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        auth_events.record(
+            "oidc_login", "failure", code=code, ip=ip, error=error, ms=round((time.perf_counter() - start) * 1000, 2),
+        )
+        if isinstance(e, HTTPException) and e.status_code == 503:
+            # Overloaded, not a bad code: let the client retry
+            raise
         raise HTTPException(status_code=400, detail=f"Token exchange failed: {str(e)}")
+
+
+# ---------------------------------------------------------------------
+# 🍪 WSO2 session: fresh access token without a new login redirect
+# ---------------------------------------------------------------------
+@app.get("/api/auth/session")
+async def get_session(request: Request):
+    session_id = request.cookies.get(SESSION_COOKIE_NAME)
+    session = await session_store.get(session_id) if session_id else None
+    if session is None:
+        raise HTTPException(status_code=401, detail="No active session")
+
+    return {
+        "access_token": session["access_token"],
+        "expires_in": max(0, int(session["access_expires_at"] - time.time())),
+        "user": session["user"],
+    }
+
+
+@app.post("/api/auth/logout")
+async def logout(request: Request, response: Response):
+    session_id = request.cookies.get(SESSION_COOKIE_NAME)
+    if session_id:
+        refresh_token = await session_store.delete(session_id)
+        if refresh_token:
+            await revoke_token(refresh_token)
+    response.delete_cookie(
+        SESSION_COOKIE_NAME,
+        path="/api/auth",
+        httponly=True,
+        secure=SESSION_COOKIE_SECURE,
+        samesite=SESSION_COOKIE_SAMESITE,
+    )
+    return {"msg": "Logged out"}
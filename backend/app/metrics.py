@@ -0,0 +1,365 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pymongo import monitoring
+
+# ---------------------------------------------------------------------
+# 📈 Minimal Prometheus-style metrics (text exposition format 0.0.4)
+# ---------------------------------------------------------------------
+# Metrics may be updated from pymongo's worker threads (command
+# monitoring) as well as the event loop, so every update takes a lock.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=(), function=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        # Optional callback returning {label_tuple: value}, read at scrape time
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        if self.function is not None:
+            items = list(self.function().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}" for labels, v in items
+        ]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(labels, (list(s[0]), s[1], s[2])) for labels, s in self._values.items()]
+        lines = self._header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', _format_value(bound)))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ---------------------------------------------------------------------
+# 🌐 HTTP server metrics
+# ---------------------------------------------------------------------
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests by route", ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ["method"]
+)
+
+# ---------------------------------------------------------------------
+# 🔌 Outbound dependency metrics (MongoDB, WSO2, SMTP, bcrypt)
+# ---------------------------------------------------------------------
+DEPENDENCY_DURATION = registry.histogram(
+    "dependency_duration_seconds", "Latency of outbound dependency calls", ["dependency", "operation", "outcome"]
+)
+
+
+_CACHES = {}
+
+
+def register_cache(name: str, cache):
+    """
+    Export a TTLCache's hit/miss/eviction counters and current size.
+    """
+    _CACHES[name] = cache
+
+
+def _cache_stat(stat: str):
+    return lambda: {(name,): getattr(cache, stat) for name, cache in _CACHES.items()}
+
+
+registry.counter("cache_hits_total", "Cache hits", ["cache"], function=_cache_stat("hits"))
+registry.counter("cache_misses_total", "Cache misses", ["cache"], function=_cache_stat("misses"))
+registry.counter("cache_evictions_total", "Cache LRU evictions", ["cache"], function=_cache_stat("evictions"))
+registry.gauge("cache_entries", "Entries currently cached", ["cache"], function=lambda: {(n,): len(c) for n, c in _CACHES.items()})
+
+
+@contextmanager
+def track_dependency(dependency: str, operation: str):
+    """
+    Time a block that calls an outbound dependency. Works around awaits:
+        with track_dependency("wso2", "token"):
+            await ...
+    """
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        DEPENDENCY_DURATION.observe(time.perf_counter() - start, dependency, operation, outcome)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Feeds every MongoDB command's server round-trip time into
+    dependency_duration_seconds{dependency="mongodb"}.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        DEPENDENCY_DURATION.observe(event.duration_micros / 1e6, "mongodb", event.command_name, "success")
+
+    def failed(self, event):
+        DEPENDENCY_DURATION.observe(event.duration_micros / 1e6, "mongodb", event.command_name, "error")
+
+
+MONGO_CHECKOUT_WAIT = registry.histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection",
+    ["address"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+MONGO_CHECKOUT_FAILED = registry.counter(
+    "mongodb_pool_checkout_failed_total", "Failed MongoDB connection checkouts", ["address", "reason"]
+)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks open, checked-out and waiting connections per server so pool
+    saturation can be exported and reported by /health. Momentary waits
+    are normal under load, so it also remembers how long the wait queue
+    has been non-empty and the recent checkout wait times.
+    """
+
+    def __init__(self, recent_checkouts: int = 200):
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._waiting_since = {}
+        self._checkout_waits = {}
+        self._recent_checkouts = recent_checkouts
+
+    def _pool(self, address):
+        key = f"{address[0]}:{address[1]}"
+        return key, self._pools.setdefault(key, {"open": 0, "checked_out": 0, "waiting": 0})
+
+    def _update(self, address, **deltas):
+        with self._lock:
+            key, pool = self._pool(address)
+            for field, delta in deltas.items():
+                pool[field] = max(0, pool[field] + delta)
+            if pool["waiting"]:
+                self._waiting_since.setdefault(key, time.monotonic())
+            else:
+                self._waiting_since.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {address: dict(pool) for address, pool in self._pools.items()}
+
+    def pressure(self, window: float) -> dict:
+        """
+        Per server: seconds the wait queue has been non-empty without a
+        break, and the checkout wait times (seconds) of the last `window`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                address: {
+                    "waiting_for": now - self._waiting_since[address] if address in self._waiting_since else 0.0,
+                    "checkout_waits": [d for at, d in self._checkout_waits.get(address, ()) if at >= now - window],
+                }
+                for address in self._pools
+            }
+
+    def pool_created(self, event):
+        self._update(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            key = self._pool(event.address)[0]
+            self._pools.pop(key, None)
+            self._waiting_since.pop(key, None)
+            self._checkout_waits.pop(key, None)
+
+    def connection_created(self, event):
+        self._update(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event.address, waiting=-1)
+        MONGO_CHECKOUT_FAILED.inc(self._pool(event.address)[0], str(event.reason))
+
+    def connection_checked_out(self, event):
+        self._update(event.address, waiting=-1, checked_out=1)
+        # `duration` (seconds) is reported by pymongo >= 4.7
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            key = self._pool(event.address)[0]
+            MONGO_CHECKOUT_WAIT.observe(duration, key)
+            with self._lock:
+                waits = self._checkout_waits.setdefault(key, deque(maxlen=self._recent_checkouts))
+                waits.append((time.monotonic(), duration))
+
+    def connection_checked_in(self, event):
+        self._update(event.address, checked_out=-1)
+
+
+mongo_pool_listener = MongoPoolListener()
+
+
+def _pool_gauge(field: str):
+    return lambda: {(address,): pool[field] for address, pool in mongo_pool_listener.stats().items()}
+
+
+registry.gauge("mongodb_pool_connections_open", "Open pooled MongoDB connections", ["address"], function=_pool_gauge("open"))
+registry.gauge("mongodb_pool_connections_checked_out", "MongoDB connections in use", ["address"], function=_pool_gauge("checked_out"))
+registry.gauge("mongodb_pool_checkouts_waiting", "Operations waiting for a MongoDB connection", ["address"], function=_pool_gauge("waiting"))
+
+# ---------------------------------------------------------------------
+# ⏱️ ASGI middleware
+# ---------------------------------------------------------------------
+class MetricsMiddleware:
+    """
+    Records latency, status code and in-flight count for every HTTP
+    request. The route label is the matched path template (e.g.
+    /api/users/{email}) so cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method)
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method,
+                getattr(route, "path", "unmatched"),
+                str(status["code"]),
+            )
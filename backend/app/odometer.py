@@ -0,0 +1,274 @@
+import sys
+import asyncio
+import secrets
+from datetime import datetime
+from typing import Optional
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.config import env_bool, env_int, env_float
+from app.database import (
+    travels_collection, travels_reporting_collection, odometers_collection,
+    odometer_findings_collection, odometer_audits_collection,
+)
+
+# ---------------------------------------------------------------------
+# 🚗 Per-user odometer continuity
+# ---------------------------------------------------------------------
+# One document per user (`_id` = email) holding the highest meter reading
+# logged so far. A new trip must start at or after it, which is checked
+# and advanced by a single conditional upsert, so two concurrent
+# submissions can never both pass the check.
+
+# Reject trips starting before the last reading; when off, readings are still tracked
+ODOMETER_ENFORCE = env_bool("ODOMETER_ENFORCE", True)
+# Rounding slack in km, for both the submission check and the audit
+ODOMETER_TOLERANCE_KM = env_float("ODOMETER_TOLERANCE_KM", 0)
+ODOMETER_AUDIT_BATCH_SIZE = env_int("ODOMETER_AUDIT_BATCH_SIZE", 1000)
+
+
+class OdometerConflict(ValueError):
+    def __init__(self, meter_start: float, last_meter_end: float):
+        self.meter_start = meter_start
+        self.last_meter_end = last_meter_end
+        super().__init__(f"Start reading {meter_start:g} is below your last recorded reading {last_meter_end:g}")
+
+
+async def last_reading(user_email: str) -> Optional[float]:
+    doc = await odometers_collection.find_one({"_id": user_email}, {"meter_end": 1})
+    return doc["meter_end"] if doc else None
+
+
+async def reserve_reading(user_email: str, meter_start: float, meter_end: float) -> Optional[float]:
+    """
+    Advance the user's reading to `meter_end` if the trip starts at or
+    after the current one. Returns the previous reading (None for a first
+    trip) so `release_reading` can undo it if the insert then fails.
+    """
+    query = {"_id": user_email}
+    if ODOMETER_ENFORCE:
+        query["meter_end"] = {"$lte": meter_start + ODOMETER_TOLERANCE_KM}
+
+    while True:
+        try:
+            doc = await odometers_collection.find_one_and_update(
+                query,
+                {"$max": {"meter_end": meter_end}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+            return doc["meter_end"] if doc else None
+        except DuplicateKeyError:
+            # The record exists but the filter did not match: the trip overlaps
+            last = await last_reading(user_email)
+            if last is not None:
+                raise OdometerConflict(meter_start, last)
+
+
+async def release_reading(user_email: str, meter_end: float, previous: Optional[float]):
+    # Only undone while nothing else has moved the reading since
+    query = {"_id": user_email, "meter_end": meter_end}
+    if previous is None:
+        await odometers_collection.delete_one(query)
+    elif previous != meter_end:
+        await odometers_collection.update_one(query, {"$set": {"meter_end": previous}})
+
+
+class ReadingTracker:
+    """
+    Continuity check for bulk submissions. Rows are checked in order
+    against the rows before them in the request and the stored reading
+    (read once per user), so overlaps are reported per row. The stored
+    reading itself is only moved by `reserve`, which claims each user's
+    range in a batch with the same conditional update as
+    `reserve_reading` before the batch is inserted.
+    """
+
+    def __init__(self):
+        self.readings = {}  # Stored reading plus the rows inserted so far
+        self.pending = {}   # Highest reading of checked rows not yet inserted
+
+    async def check(self, user_email: str, meter_start: float, meter_end: float):
+        if user_email not in self.readings:
+            self.readings[user_email] = await last_reading(user_email)
+        last = self.pending.get(user_email, self.readings[user_email])
+        if last is not None and ODOMETER_ENFORCE and meter_start + ODOMETER_TOLERANCE_KM < last:
+            raise OdometerConflict(meter_start, last)
+        self.pending[user_email] = meter_end if last is None else max(last, meter_end)
+
+    async def reserve(self, logs: list) -> tuple:
+        """
+        Reserve every user's range in `logs` (lowest meter_start to highest
+        meter_end). Returns the reservations, to pass to `settle`, and the
+        users whose range overlaps a reading stored since it was checked.
+        """
+        ranges = {}
+        for log in logs:
+            low, high = ranges.get(log["user_email"], (log["meter_start"], log["meter_end"]))
+            ranges[log["user_email"]] = (min(low, log["meter_start"]), max(high, log["meter_end"]))
+
+        reservations, conflicts = {}, {}
+        for user_email, (meter_start, meter_end) in ranges.items():
+            try:
+                reservations[user_email] = (meter_end, await reserve_reading(user_email, meter_start, meter_end))
+            except OdometerConflict as e:
+                conflicts[user_email] = e
+                self.readings[user_email] = e.last_meter_end
+        self.pending.clear()
+        return reservations, conflicts
+
+    async def settle(self, reservations: dict, inserted: list):
+        """
+        Record the rows that were inserted and give back the part of each
+        reservation above them (all of it if none were inserted).
+        """
+        highest = {}
+        for log in inserted:
+            highest[log["user_email"]] = max(highest.get(log["user_email"], log["meter_end"]), log["meter_end"])
+
+        for user_email, (meter_end, previous) in reservations.items():
+            reached = highest.get(user_email)
+            if reached is not None:
+                current = self.readings.get(user_email)
+                self.readings[user_email] = reached if current is None else max(current, reached)
+            if reached != meter_end:
+                keep = reached if previous is None else max(previous, reached if reached is not None else previous)
+                await release_reading(user_email, meter_end, keep)
+
+
+async def apply_readings(logs: list):
+    highest = {}
+    for log in logs:
+        highest[log["user_email"]] = max(highest.get(log["user_email"], log["meter_end"]), log["meter_end"])
+
+    if not highest:
+        return
+    now = datetime.utcnow()
+    await odometers_collection.bulk_write(
+        [
+            UpdateOne({"_id": email}, {"$max": {"meter_end": meter_end}, "$set": {"updated_at": now}}, upsert=True)
+            for email, meter_end in highest.items()
+        ],
+        ordered=False,
+    )
+
+
+# -------------------------
+# Batch jobs
+# -------------------------
+async def sync_readings() -> int:
+    """
+    Seed the per-user readings from the existing travel logs (highest
+    meter_end per user). $max makes it safe to run against a live system.
+    """
+    pipeline = [{"$group": {"_id": "$user_email", "meter_end": {"$max": "$meter_end"}}}]
+    logs = await travels_collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+    await apply_readings([{"user_email": doc["_id"], "meter_end": doc["meter_end"]} for doc in logs if doc["_id"]])
+    return len(logs)
+
+
+def _finding(run_id: str, previous: dict, log: dict) -> Optional[dict]:
+    delta = log["meter_start"] - previous["meter_end"]
+    if abs(delta) <= ODOMETER_TOLERANCE_KM:
+        return None
+    return {
+        "run_id": run_id,
+        "user_email": log["user_email"],
+        "type": "gap" if delta > 0 else "overlap",
+        "km": abs(delta),
+        "previous_id": previous["_id"],
+        "previous_meter_end": previous["meter_end"],
+        "previous_created_at": previous["created_at"],
+        "log_id": log["_id"],
+        "meter_start": log["meter_start"],
+        "created_at": log["created_at"],
+    }
+
+
+async def audit_readings() -> dict:
+    """
+    One pass over every travel log in (user_email, created_at) order,
+    served by the index of the same name, comparing each trip's start
+    with the previous trip's end. Findings replace those of the previous
+    run once the scan is complete.
+    """
+    run_id = secrets.token_hex(8)
+    started_at = datetime.utcnow()
+    summary = {"_id": run_id, "started_at": started_at, "logs": 0, "users": 0, "gaps": 0, "overlaps": 0}
+
+    cursor = travels_reporting_collection.find(
+        {}, {"user_email": 1, "created_at": 1, "meter_start": 1, "meter_end": 1}
+    ).sort([("user_email", ASCENDING), ("created_at", ASCENDING)]).batch_size(ODOMETER_AUDIT_BATCH_SIZE)
+
+    previous = None
+    batch = []
+    async for log in cursor:
+        summary["logs"] += 1
+        if previous is None or previous["user_email"] != log["user_email"]:
+            summary["users"] += 1
+        else:
+            finding = _finding(run_id, previous, log)
+            if finding:
+                summary["gaps" if finding["type"] == "gap" else "overlaps"] += 1
+                batch.append(finding)
+                if len(batch) >= ODOMETER_AUDIT_BATCH_SIZE:
+                    await odometer_findings_collection.insert_many(batch)
+                    batch = []
+        previous = log
+    if batch:
+        await odometer_findings_collection.insert_many(batch)
+
+    summary["finished_at"] = datetime.utcnow()
+    await odometer_audits_collection.insert_one(summary)
+    await odometer_findings_collection.delete_many({"run_id": {"$ne": run_id}})
+    await odometer_audits_collection.delete_many({"_id": {"$ne": run_id}})
+    return summary
+
+
+_audit_task = None
+
+
+def start_audit() -> bool:
+    """Run `audit_readings` in the background; False if one is already running."""
+    global _audit_task
+    if _audit_task is not None and not _audit_task.done():
+        return False
+    _audit_task = asyncio.create_task(audit_readings())
+    return True
+
+
+def audit_running() -> bool:
+    return _audit_task is not None and not _audit_task.done()
+
+
+async def latest_audit(user_email: Optional[str] = None, finding_type: Optional[str] = None, limit: int = 100) -> dict:
+    summary = await odometer_audits_collection.find_one({}, sort=[("finished_at", -1)])
+    if summary is None:
+        return {"audit": None, "running": audit_running(), "findings": []}
+
+    query = {"run_id": summary["_id"]}
+    if user_email:
+        query["user_email"] = user_email
+    if finding_type:
+        query["type"] = finding_type
+    findings = await odometer_findings_collection.find(query, {"run_id": 0}) \
+        .sort([("user_email", ASCENDING), ("created_at", ASCENDING)]).to_list(limit)
+    return {"audit": summary, "running": audit_running(), "findings": findings}
+
+
+async def _main(command: str) -> int:
+    if command == "sync":
+        count = await sync_readings()
+        print(f"✅ Synced odometer readings for {count} users")
+    else:
+        summary = await audit_readings()
+        print(f"🔎 Audited {summary['logs']} logs of {summary['users']} users: "
+              f"{summary['gaps']} gaps, {summary['overlaps']} overlaps")
+    return 0
+
+
+if __name__ == "__main__":
+    # python -m app.odometer audit|sync
+    if sys.argv[1:] not in (["audit"], ["sync"]):
+        print("Usage: python -m app.odometer audit|sync")
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(sys.argv[1])))
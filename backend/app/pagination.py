@@ -0,0 +1,121 @@
+import base64
+from typing import Optional
+from bson import json_util
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from app.config import env_int
+from app.responses import dumps
+
+DEFAULT_PAGE_SIZE = env_int("PAGE_SIZE_DEFAULT", 1000)
+MAX_PAGE_SIZE = env_int("PAGE_SIZE_MAX", 5000)
+STREAM_BATCH_SIZE = env_int("STREAM_BATCH_SIZE", 500)
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# -------------------------
+# Cursor encoding
+# -------------------------
+def encode_cursor(doc: dict, sort_fields: list) -> str:
+    values = [doc.get(field) for field in sort_fields]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str, sort_fields: list) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort_fields):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_filter(sort_fields: list, values: list) -> dict:
+    """
+    Filter selecting documents strictly after `values` in ascending
+    (sort_fields[0], sort_fields[1], ...) order.
+    """
+    clauses = []
+    for i, field in enumerate(sort_fields):
+        clause = {sort_fields[j]: values[j] for j in range(i)}
+        clause[field] = {"$gt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+# -------------------------
+# Query helpers
+# -------------------------
+def parse_fields(fields: Optional[str], always: list = ()) -> Optional[dict]:
+    """
+    Turn `fields=a,b,c` into a Mongo projection. Sort keys in `always`
+    are kept so the next cursor can still be computed.
+    """
+    if not fields:
+        return None
+    projection = {f.strip(): 1 for f in fields.split(",") if f.strip()}
+    for field in always:
+        projection[field] = 1
+    return projection
+
+def date_range_filter(field: str, date_from: Optional[str], date_to: Optional[str]) -> dict:
+    bounds = {}
+    if date_from:
+        bounds["$gte"] = date_from
+    if date_to:
+        bounds["$lte"] = date_to
+    return {field: bounds} if bounds else {}
+
+async def fetch_page(collection, query: dict, sort_fields: list, limit: int,
+                     cursor: Optional[str] = None, projection: Optional[dict] = None):
+    """
+    Return one keyset page and the cursor for the next one (None on the last page).
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort_fields, decode_cursor(cursor, sort_fields))]}
+
+    docs = await (
+        collection.find(query, projection)
+        .sort([(field, 1) for field in sort_fields])
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_fields)
+    return docs, next_cursor
+
+def find_from_cursor(collection, query: dict, sort_fields: list, cursor: Optional[str] = None,
+                     projection: Optional[dict] = None, limit: Optional[int] = None):
+    """
+    Motor cursor over every document after `cursor`, for streaming responses.
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort_fields, decode_cursor(cursor, sort_fields))]}
+    mongo_cursor = (
+        collection.find(query, projection)
+        .sort([(field, 1) for field in sort_fields])
+        .batch_size(STREAM_BATCH_SIZE)
+    )
+    if limit:
+        mongo_cursor = mongo_cursor.limit(limit)
+    return mongo_cursor
+
+# -------------------------
+# NDJSON streaming
+# -------------------------
+async def iter_ndjson(mongo_cursor, batch_size: int = STREAM_BATCH_SIZE, drop_fields: tuple = ()):
+    batch = []
+    async for doc in mongo_cursor:
+        for field in drop_fields:
+            doc.pop(field, None)
+        batch.append(dumps(doc))
+        if len(batch) >= batch_size:
+            yield b"\n".join(batch) + b"\n"
+            batch = []
+    if batch:
+        yield b"\n".join(batch) + b"\n"
+
+def ndjson_response(mongo_cursor, drop_fields: tuple = ()) -> StreamingResponse:
+    return StreamingResponse(
+        iter_ndjson(mongo_cursor, drop_fields=drop_fields),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,129 @@
+import orjson
+from app.config import env, env_int, env_float
+from app.cache import TTLCache
+from app.metrics import register_cache, registry
+from app.responses import dumps
+
+# ---------------------------------------------------------------------
+# 👤 /api/users/me profile cache
+# ---------------------------------------------------------------------
+PROFILE_CACHE_SIZE = env_int("PROFILE_CACHE_SIZE", 10000)
+PROFILE_CACHE_TTL = env_float("PROFILE_CACHE_TTL", 30)
+# Optional shared backend, kept by all workers; invalidating it reaches
+# every worker once their short-lived local copies (below) expire
+PROFILE_CACHE_REDIS_URL = env("PROFILE_CACHE_REDIS_URL")
+# TTL of the in-process copy when the shared backend is configured
+PROFILE_CACHE_LOCAL_TTL = env_float("PROFILE_CACHE_LOCAL_TTL", 1)
+
+# Store a profile only if no invalidation ran since its fill started
+_SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[2] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+SHARED_HITS = registry.counter("profile_cache_shared_hits_total", "Profile lookups served by the shared cache")
+SHARED_ERRORS = registry.counter("profile_cache_shared_errors_total", "Shared profile cache failures")
+
+
+class ProfileCache:
+    """
+    Two-level profile cache: an in-process LRU in front of an optional
+    Redis backend. Writers invalidate both levels. With Redis the local
+    copies live PROFILE_CACHE_LOCAL_TTL (1s), so other workers see a
+    change within a second; without it they may serve a stale profile
+    for up to PROFILE_CACHE_TTL seconds.
+
+    Fills are guarded by a generation: `generation()` is read before the
+    database and `set` drops the profile if an invalidation ran since,
+    so a slow read cannot re-cache the profile it replaced.
+    """
+
+    def __init__(self):
+        self.shared = None
+        if PROFILE_CACHE_REDIS_URL:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("PROFILE_CACHE_REDIS_URL is set but the 'redis' package is not installed")
+            self.shared = redis.from_url(PROFILE_CACHE_REDIS_URL)
+            self._set_if_generation = self.shared.register_script(_SET_IF_GENERATION)
+        ttl = PROFILE_CACHE_LOCAL_TTL if self.shared is not None else PROFILE_CACHE_TTL
+        self.local = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=ttl)
+        # Bumped by every local invalidation (one counter keeps memory bounded)
+        self._local_generation = 0
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return f"profile:{email}"
+
+    @staticmethod
+    def _generation_key(email: str) -> str:
+        return f"profile_gen:{email}"
+
+    async def generation(self, email: str) -> tuple:
+        shared = None
+        if self.shared is not None:
+            try:
+                shared = (await self.shared.get(self._generation_key(email)) or b"0").decode()
+            except Exception as e:
+                SHARED_ERRORS.inc()
+                print("⚠️ Shared profile cache read failed:", e)
+        return self._local_generation, shared
+
+    async def get(self, email: str):
+        profile = self.local.get(email)
+        if profile is not None:
+            return dict(profile)
+
+        if self.shared is not None:
+            try:
+                raw = await self.shared.get(self._key(email))
+            except Exception as e:
+                SHARED_ERRORS.inc()
+                print("⚠️ Shared profile cache read failed:", e)
+                return None
+            if raw is not None:
+                SHARED_HITS.inc()
+                profile = orjson.loads(raw)
+                self.local.set(email, profile)
+                return dict(profile)
+        return None
+
+    async def set(self, email: str, profile: dict, generation: tuple):
+        local, shared = generation
+        if local != self._local_generation:
+            return
+        self.local.set(email, profile)
+        if self.shared is not None and shared is not None:
+            try:
+                await self._set_if_generation(
+                    keys=[self._key(email), self._generation_key(email)],
+                    args=[dumps(profile), shared, int(PROFILE_CACHE_TTL)],
+                )
+            except Exception as e:
+                SHARED_ERRORS.inc()
+                print("⚠️ Shared profile cache write failed:", e)
+
+    async def invalidate(self, *emails: str):
+        self._local_generation += 1
+        for email in emails:
+            self.local.delete(email)
+        if self.shared is not None and emails:
+            try:
+                async with self.shared.pipeline(transaction=True) as pipe:
+                    for email in emails:
+                        pipe.incr(self._generation_key(email))
+                        # Outlives any fill that could have read the old generation
+                        pipe.expire(self._generation_key(email), 3600)
+                    pipe.delete(*[self._key(email) for email in emails])
+                    await pipe.execute()
+            except Exception as e:
+                SHARED_ERRORS.inc()
+                print("⚠️ Shared profile cache invalidation failed:", e)
+
+
+profile_cache = ProfileCache()
+register_cache("profile", profile_cache.local)
@@ -0,0 +1,188 @@
+import math
+import time
+import asyncio
+from datetime import datetime, timedelta
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+from app.config import env, env_int, env_bool
+from app.database import db
+from app.metrics import registry
+
+# ---------------------------------------------------------------------
+# 🚦 Rate limiting config
+# ---------------------------------------------------------------------
+RATE_LIMIT_BACKEND = env("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = env_int("RATE_LIMIT_MAX_KEYS", 100000)
+# Only enable behind a proxy that overwrites X-Forwarded-For
+TRUST_FORWARDED_FOR = env_bool("TRUST_FORWARDED_FOR", False)
+
+# "<requests>/<seconds>" per route and key type. Override any of them with
+# RATE_LIMIT_<ROUTE>_<KEY>, e.g. RATE_LIMIT_LOGIN_EMAIL=10/60, or "off".
+DEFAULT_LIMITS = {
+    "login": {"ip": "20/60", "email": "5/60"},
+    "register": {"ip": "5/60"},
+    "forgot_password": {"ip": "5/60", "email": "3/900"},
+    "oidc_callback": {"ip": "20/60", "client_id": "300/60"},
+}
+
+RATE_LIMITED = registry.counter("rate_limited_total", "Requests rejected by the rate limiter", ["route", "key"])
+
+
+def _parse_limit(value: str):
+    if not value or value.lower() == "off":
+        return None
+    requests, seconds = value.split("/")
+    return int(requests), int(seconds)
+
+
+def _load_limits() -> dict:
+    limits = {}
+    for route, keys in DEFAULT_LIMITS.items():
+        for key, default in keys.items():
+            value = env(f"RATE_LIMIT_{route.upper()}_{key.upper()}", default)
+            limits[(route, key)] = _parse_limit(value)
+    return limits
+
+
+LIMITS = _load_limits()
+
+
+def _sliding_window(previous: int, current: int, elapsed: float, limit: int, window: int):
+    """
+    Sliding-window counter: the previous window's count is weighted by how
+    much of it still overlaps the sliding window. Returns (allowed,
+    retry_after_seconds).
+    """
+    weighted = previous * (1 - elapsed / window) + current
+    if weighted <= limit:
+        return True, 0
+    if current > limit or previous == 0:
+        return False, math.ceil(window - elapsed)
+    # Time until the previous window's weight has decayed enough
+    free_at = window * (1 - (limit - current) / previous)
+    return False, max(1, math.ceil(free_at - elapsed))
+
+
+class InMemoryRateLimitBackend:
+    """
+    Per-process counters keyed by (key, window index). Stale keys are
+    purged periodically and the table is bounded by RATE_LIMIT_MAX_KEYS.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._counts = {}
+        self._ops = 0
+
+    def _purge(self, now: float):
+        for key in [k for k, (index, _, _, window) in self._counts.items() if index < now // window - 1]:
+            del self._counts[key]
+        while len(self._counts) > self.max_keys:
+            del self._counts[next(iter(self._counts))]
+
+    async def hit(self, key: str, window: int):
+        now = time.time()
+        index = int(now // window)
+        self._ops += 1
+        if self._ops % 1000 == 0 or len(self._counts) > self.max_keys:
+            self._purge(now)
+
+        stored_index, previous, current, _ = self._counts.get(key, (index, 0, 0, window))
+        if stored_index != index:
+            previous = current if stored_index == index - 1 else 0
+            current = 0
+        current += 1
+        self._counts[key] = (index, previous, current, window)
+        return previous, current, now - index * window
+
+
+class MongoRateLimitBackend:
+    """
+    Counters shared by every worker: one document per (key, window) bumped
+    with an atomic $inc upsert and expired through a TTL index.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def setup(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def hit(self, key: str, window: int):
+        now = time.time()
+        index = int(now // window)
+        expires_at = datetime.utcnow() + timedelta(seconds=2 * window)
+        current_doc, previous_doc = await asyncio.gather(
+            self.collection.find_one_and_update(
+                {"_id": f"{key}:{index}"},
+                {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": expires_at}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            ),
+            self.collection.find_one({"_id": f"{key}:{index - 1}"}),
+        )
+        previous = previous_doc["count"] if previous_doc else 0
+        return previous, current_doc["count"], now - index * window
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def setup(self):
+        if hasattr(self.backend, "setup"):
+            await self.backend.setup()
+
+    async def check(self, route: str, key_type: str, key_value: str):
+        """
+        Count one attempt for `key_value` and raise 429 if it is over the
+        configured limit for (route, key_type). Backend failures fail open.
+        """
+        limit = LIMITS.get((route, key_type))
+        if limit is None or not key_value:
+            return
+        requests, window = limit
+
+        try:
+            previous, current, elapsed = await self.backend.hit(f"{route}:{key_type}:{key_value}", window)
+        except Exception as e:
+            print("⚠️ Rate limiter backend unavailable:", e)
+            return
+
+        allowed, retry_after = _sliding_window(previous, current, elapsed, requests, window)
+        if not allowed:
+            RATE_LIMITED.inc(route, key_type)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else ""
+
+
+def create_rate_limiter() -> RateLimiter:
+    if RATE_LIMIT_BACKEND == "memory":
+        return RateLimiter(InMemoryRateLimitBackend())
+    if RATE_LIMIT_BACKEND == "mongo":
+        return RateLimiter(MongoRateLimitBackend(db["rate_limits"]))
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {RATE_LIMIT_BACKEND}")
+
+
+rate_limiter = create_rate_limiter()
+
+
+def rate_limit(route: str):
+    """
+    Dependency enforcing the per-IP limit for `route` before the body is
+    processed. Per-email/client limits are checked inside the handler.
+    """
+    async def dependency(request: Request):
+        await rate_limiter.check(route, "ip", client_ip(request))
+    return dependency
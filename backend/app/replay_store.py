@@ -0,0 +1,123 @@
+import time
+import math
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from app.config import env, env_int
+from app.database import db
+
+# ---------------------------------------------------------------------
+# 🧱 Authorization-code replay protection config
+# ---------------------------------------------------------------------
+REPLAY_STORE_BACKEND = env("REPLAY_STORE_BACKEND", "mongo")
+# WSO2 codes are valid for 300s by default; remember them a bit longer
+REPLAY_TTL_SECONDS = env_int("REPLAY_TTL_SECONDS", 600)
+REPLAY_MAX_ENTRIES = env_int("REPLAY_MAX_ENTRIES", 100000)
+REPLAY_BUCKETS = env_int("REPLAY_BUCKETS", 10)
+
+
+def code_digest(code: str) -> bytes:
+    # Store a fixed-size digest instead of the raw code
+    return hashlib.blake2b(code.encode(), digest_size=16).digest()
+
+
+class ReplayStore(ABC):
+    """
+    Remembers authorization codes that have already been presented.
+    `mark_used` claims a code atomically and returns False if it was seen before.
+    """
+
+    @abstractmethod
+    async def mark_used(self, code: str) -> bool:
+        ...
+
+    async def setup(self):
+        pass
+
+
+class InMemoryReplayStore(ReplayStore):
+    """
+    Per-process store. Codes are grouped into time buckets covering the TTL,
+    so expiry drops a whole bucket at once instead of scanning entries.
+    Codes are never forgotten before their TTL: once the size bound is
+    reached with live codes, new ones are refused with 503 until the
+    oldest bucket expires.
+    """
+
+    def __init__(self, ttl: int = REPLAY_TTL_SECONDS, max_entries: int = REPLAY_MAX_ENTRIES,
+                 buckets: int = REPLAY_BUCKETS, clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bucket_width = max(ttl / buckets, 1)
+        self.buckets = buckets
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._size = 0
+
+    def _evict(self, current: int):
+        # A bucket has expired once its newest code is older than the TTL
+        while self._buckets:
+            bucket_id = next(iter(self._buckets))
+            if bucket_id + self.buckets >= current:
+                break
+            self._size -= len(self._buckets.popitem(last=False)[1])
+
+    async def mark_used(self, code: str) -> bool:
+        digest = code_digest(code)
+        current = int(self.clock() // self.bucket_width)
+        self._evict(current)
+
+        for codes in self._buckets.values():
+            if digest in codes:
+                return False
+
+        if self._size >= self.max_entries:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many logins in progress, please retry",
+                headers={"Retry-After": str(math.ceil(self.bucket_width))},
+            )
+        bucket = self._buckets.get(current)
+        if bucket is None:
+            bucket = self._buckets[current] = set()
+        bucket.add(digest)
+        self._size += 1
+        return True
+
+    def __len__(self):
+        return self._size
+
+
+class MongoReplayStore(ReplayStore):
+    """
+    Store shared by every worker. The unique `_id` makes the claim atomic and
+    a TTL index on `created_at` lets MongoDB expire old codes.
+    """
+
+    def __init__(self, collection, ttl: int = REPLAY_TTL_SECONDS):
+        self.collection = collection
+        self.ttl = ttl
+
+    async def setup(self):
+        await self.collection.create_index("created_at", expireAfterSeconds=self.ttl)
+
+    async def mark_used(self, code: str) -> bool:
+        try:
+            await self.collection.insert_one({"_id": code_digest(code), "created_at": datetime.utcnow()})
+            return True
+        except DuplicateKeyError:
+            return False
+
+
+def create_replay_store() -> ReplayStore:
+    if REPLAY_STORE_BACKEND == "memory":
+        return InMemoryReplayStore()
+    if REPLAY_STORE_BACKEND == "mongo":
+        return MongoReplayStore(db["used_auth_codes"])
+    raise ValueError(f"Unknown REPLAY_STORE_BACKEND: {REPLAY_STORE_BACKEND}")
+
+
+replay_store = create_replay_store()
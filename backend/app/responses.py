@@ -0,0 +1,27 @@
+import orjson
+from bson import ObjectId
+from fastapi.responses import Response
+
+# ---------------------------------------------------------------------
+# ⚡ Fast JSON responses for raw MongoDB documents
+# ---------------------------------------------------------------------
+# Returning this response directly bypasses FastAPI's jsonable_encoder:
+# orjson encodes datetimes natively and ObjectIds go through bson_default,
+# so documents from Motor can be returned as-is without fix_ids().
+
+
+def bson_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=bson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class MongoJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,109 @@
+import sys
+import asyncio
+from datetime import datetime
+from pymongo import UpdateOne
+from app.database import travels_collection, rollups_collection
+
+# ---------------------------------------------------------------------
+# 📊 Per-user, per-month mileage rollups
+# ---------------------------------------------------------------------
+# One document per (user_email, month) holding running totals that
+# add_travel bumps with $inc, so reports read O(users) documents
+# instead of scanning every travel log.
+
+ROLLUP_FIELDS = ("total_km", "official_km", "private_km")
+
+
+def month_of(date: str) -> str:
+    # Travel logs store `date` as YYYY-MM-DD
+    return date[:7]
+
+
+def rollup_id(user_email: str, month: str) -> str:
+    return f"{user_email}|{month}"
+
+
+def _rollup_update(user_email: str, month: str, increments: dict) -> tuple:
+    return (
+        {"_id": rollup_id(user_email, month)},
+        {
+            "$inc": increments,
+            "$setOnInsert": {"user_email": user_email, "month": month},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+    )
+
+
+async def apply_rollup(log: dict):
+    """
+    Add a single inserted travel log to its rollup (atomic upsert + $inc).
+    """
+    increments = {field: log[field] for field in ROLLUP_FIELDS}
+    increments["count"] = 1
+    query, update = _rollup_update(log["user_email"], month_of(log["date"]), increments)
+    await rollups_collection.update_one(query, update, upsert=True)
+
+
+async def apply_rollups(logs: list):
+    """
+    Add many inserted travel logs with one unordered bulk_write, merging
+    logs that share a (user, month) into a single $inc.
+    """
+    merged = {}
+    for log in logs:
+        key = (log["user_email"], month_of(log["date"]))
+        increments = merged.setdefault(key, {field: 0 for field in ROLLUP_FIELDS} | {"count": 0})
+        for field in ROLLUP_FIELDS:
+            increments[field] += log[field]
+        increments["count"] += 1
+
+    if not merged:
+        return
+    await rollups_collection.bulk_write(
+        [UpdateOne(*_rollup_update(email, month, inc), upsert=True) for (email, month), inc in merged.items()],
+        ordered=False,
+    )
+
+
+async def rebuild_rollups():
+    """
+    Recompute every rollup from the raw travel logs with an aggregation
+    pipeline. $out swaps the collection in atomically when the pipeline
+    finishes; logs inserted while it runs are not included, so run this
+    during a quiet period.
+    """
+    pipeline = [
+        {
+            "$group": {
+                "_id": {"user_email": "$user_email", "month": {"$substrCP": ["$date", 0, 7]}},
+                "total_km": {"$sum": "$total_km"},
+                "official_km": {"$sum": "$official_km"},
+                "private_km": {"$sum": "$private_km"},
+                "count": {"$sum": 1},
+            }
+        },
+        {
+            "$project": {
+                "_id": {"$concat": ["$_id.user_email", "|", "$_id.month"]},
+                "user_email": "$_id.user_email",
+                "month": "$_id.month",
+                "total_km": 1,
+                "official_km": 1,
+                "private_km": 1,
+                "count": 1,
+                "updated_at": "$$NOW",
+            }
+        },
+        {"$out": rollups_collection.name},
+    ]
+    await travels_collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+    return await rollups_collection.count_documents({})
+
+
+if __name__ == "__main__":
+    # python -m app.rollups rebuild
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.rollups rebuild")
+        sys.exit(2)
+    count = asyncio.run(rebuild_rollups())
+    print(f"✅ Rebuilt {count} rollup documents")
@@ -1,10 +1,153 @@
-from fastapi import APIRouter, Depends
-from app.auth import role_required
-from app.database import travels_collection
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pymongo.errors import OperationFailure
+from typing import Optional
+from datetime import datetime, timezone
+from app.analytics import METRICS, analytics_cache, fleet_analytics
+from app.auth import role_required, token_cache
+from app.auth_events import auth_events
+from app.database import rollups_reporting_collection
+from app.live_feed import travel_feed
+from app.odometer import latest_audit, start_audit
+from app.profile_cache import profile_cache
+from app.responses import MongoJSONResponse
+from app.pagination import MAX_PAGE_SIZE
+from app.routes.travels import list_travels
 
 router = APIRouter()
 
 @router.get("/all")
-async def get_all_travels(admin=Depends(role_required("admin"))):
-    logs = await travels_collection.find().to_list(1000)
-    return logs
+async def get_all_travels(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user_email: Optional[str] = None,
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    fields: Optional[str] = Query(None, description="Comma-separated projection"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    admin=Depends(role_required("admin")),
+):
+    return await list_travels(limit, cursor, user_email, date_from, date_to, fields, format)
+
+# -------------------------
+# Admin: Live Travel Log Feed
+# -------------------------
+@router.get("/stream")
+async def stream_travels(
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    admin=Depends(role_required("admin")),
+):
+    """
+    Server-Sent Events with every inserted or updated travel log. Clients
+    load the current list once from /all, then apply `insert`/`update`
+    events; after reconnecting with Last-Event-ID they receive what they
+    missed, or a `reset` event if that is no longer possible.
+    """
+    if not travel_feed.available:
+        raise HTTPException(status_code=503, detail=f"Live feed unavailable: {travel_feed.error or 'not started'}")
+    if travel_feed.full:
+        raise HTTPException(status_code=503, detail="Too many live feed subscribers", headers={"Retry-After": "30"})
+    return StreamingResponse(
+        travel_feed.events(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/cache/stats")
+async def get_cache_stats(admin=Depends(role_required("admin"))):
+    return {
+        "token_cache": token_cache.stats(),
+        "profile_cache": profile_cache.local.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "live_feed": travel_feed.stats(),
+        "auth_events": auth_events.stats(),
+    }
+
+# -------------------------
+# Admin: Monthly Mileage Summaries
+# -------------------------
+@router.get("/summary")
+async def get_monthly_summary(month: str = Query(..., pattern=r"^\d{4}-\d{2}$"), admin=Depends(role_required("admin"))):
+    rollups = await rollups_reporting_collection.find({"month": month}, {"_id": 0}).sort("user_email", 1).to_list(None)
+    totals = {"total_km": 0, "official_km": 0, "private_km": 0, "count": 0}
+    for rollup in rollups:
+        for field in totals:
+            totals[field] += rollup.get(field, 0)
+    return MongoJSONResponse({"month": month, "totals": totals, "users": rollups})
+
+@router.get("/summary/{email}")
+async def get_user_summary(email: str, admin=Depends(role_required("admin"))):
+    return MongoJSONResponse(await rollups_reporting_collection.find({"user_email": email}, {"_id": 0}).sort("month", 1).to_list(None))
+
+# -------------------------
+# Admin: Fleet Analytics
+# -------------------------
+@router.get("/analytics")
+async def get_fleet_analytics(
+    metrics: str = Query(",".join(METRICS), description="Comma-separated: " + ",".join(METRICS)),
+    date_from: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    date_to: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    user_email: Optional[str] = None,
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    top: int = Query(10, ge=1, le=100),
+    admin=Depends(role_required("admin")),
+):
+    """
+    Fleet totals, top drivers by private km, day/week/month trends and
+    trip-length percentiles, computed by one aggregation and cached briefly.
+    """
+    requested = [m.strip() for m in metrics.split(",") if m.strip()]
+    unknown = [m for m in requested if m not in METRICS]
+    if not requested or unknown:
+        raise HTTPException(status_code=400, detail=f"metrics must be a subset of: {', '.join(METRICS)}")
+
+    try:
+        result = await fleet_analytics(requested, date_from, date_to, user_email, granularity, top)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
+    except OperationFailure as e:
+        raise HTTPException(status_code=500, detail=f"Analytics query failed: {e}")
+    return MongoJSONResponse(result)
+
+# -------------------------
+# Admin: Odometer Continuity Audit
+# -------------------------
+@router.get("/odometer/audit")
+async def get_odometer_audit(
+    user_email: Optional[str] = None,
+    type: Optional[str] = Query(None, pattern="^(gap|overlap)$"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    admin=Depends(role_required("admin")),
+):
+    """
+    Gaps and overlaps between consecutive trips found by the last audit run.
+    """
+    return MongoJSONResponse(await latest_audit(user_email, type, limit))
+
+@router.post("/odometer/audit", status_code=202)
+async def run_odometer_audit(admin=Depends(role_required("admin"))):
+    if not start_audit():
+        raise HTTPException(status_code=409, detail="An odometer audit is already running")
+    return {"msg": "🔎 Odometer audit started"}
+
+# -------------------------
+# Admin: Auth Events
+# -------------------------
+@router.get("/auth-events/failures")
+async def get_auth_failures(
+    since: Optional[datetime] = Query(None, description="ISO 8601; naive values are UTC"),
+    email: Optional[str] = None,
+    event: Optional[str] = Query(None, description="e.g. password_login, oidc_login, token_exchange"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    admin=Depends(role_required("admin")),
+):
+    """
+    Most recent failed logins and WSO2 token/userinfo errors, newest
+    first. Secrets in the events are replaced by fingerprints.
+    """
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return MongoJSONResponse({
+        "failures": await auth_events.recent_failures(since, email, event, limit),
+        "dropped": auth_events.dropped,
+    })
@@ -1,10 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from datetime import date, datetime
 from typing import Optional
-from app.database import travels_collection
+from app.database import travels_collection, rollups_collection, travels_reporting_collection
+from app.rollups import apply_rollup, apply_rollups
+from app.odometer import OdometerConflict, ReadingTracker, release_reading, reserve_reading
+from app.idempotency import (
+    IDEMPOTENCY_KEY_HEADER, IDEMPOTENCY_KEY_MAX_LENGTH, IDEMPOTENT_REPLAY_HEADER,
+    idempotency_store, request_fingerprint,
+)
+from app.ingest import BULK_BATCH_SIZE, BULK_MAX_BATCH_SIZE, RowErrors, iter_rows, format_validation_error
 from app.auth import get_current_user, role_required
-from bson import ObjectId
+from app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+    parse_fields, date_range_filter, fetch_page, find_from_cursor, ndjson_response,
+)
+from app.export import iter_csv, iter_xlsx, gzip_stream
+from fastapi.responses import StreamingResponse
+from app.responses import MongoJSONResponse
 
 router = APIRouter()
 
@@ -18,50 +32,309 @@ class TravelLogRequest(BaseModel):
     private_km: float
     remarks: Optional[str] = ""
 
-# -------------------------
-# Helper to fix MongoDB _id
-# -------------------------
-def fix_ids(doc):
-    if "_id" in doc and isinstance(doc["_id"], ObjectId):
-        doc["_id"] = str(doc["_id"])
-    return doc
+class BulkTravelLogRow(TravelLogRequest):
+    # Only admins may log trips on behalf of another user
+    user_email: Optional[EmailStr] = None
+    # Trip day (YYYY-MM-DD) for imported history; defaults to today
+    trip_date: Optional[date] = Field(None, alias="date")
 
 # -------------------------
-# Employee: Add Travel Log
+# Helper: build a travel log document
 # -------------------------
-@router.post("/")
-async def add_travel(log: TravelLogRequest, user=Depends(get_current_user)):
-    if log.meter_end < log.meter_start:
-        raise HTTPException(status_code=400, detail="End reading must be >= start")
+METER_RULE_ERROR = "End reading must be >= start"
 
-    total_km = log.meter_end - log.meter_start
+def build_log_data(log: TravelLogRequest, user_email: str, trip_date: Optional[date] = None):
+    if log.meter_end < log.meter_start:
+        raise ValueError(METER_RULE_ERROR)
 
-    log_data = {
-        "user_email": user["sub"],
-        "date": datetime.utcnow().strftime("%Y-%m-%d"),
+    now = datetime.utcnow()
+    if trip_date is not None:
+        if trip_date > now.date():
+            raise ValueError("Trip date cannot be in the future")
+        # Backdated trips are filed under their own day in rollups, analytics and the audit
+        now = datetime.combine(trip_date, now.time())
+    return {
+        "user_email": user_email,
+        "date": now.strftime("%Y-%m-%d"),
         "meter_start": log.meter_start,
         "meter_end": log.meter_end,
         "official_km": log.official_km,
         "private_km": log.private_km,
-        "total_km": total_km,
+        "total_km": log.meter_end - log.meter_start,
         "remarks": log.remarks,
-        "created_at": datetime.utcnow()
+        "created_at": now,
     }
-    result = await travels_collection.insert_one(log_data)
+
+# -------------------------
+# Helper: admin listing filters
+# -------------------------
+TRAVEL_SORT_FIELDS = ["created_at", "_id"]
+
+def travel_filters(user_email: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None):
+    query = {}
+    if user_email:
+        query["user_email"] = user_email
+    query.update(date_range_filter("date", date_from, date_to))
+    return query
+
+async def list_travels(limit: Optional[int], cursor: Optional[str],
+                       user_email: Optional[str], date_from: Optional[str], date_to: Optional[str],
+                       fields: Optional[str], format: str):
+    """
+    Keyset-paginated listing ordered by (created_at, _id). JSON pages carry
+    the next cursor in the X-Next-Cursor header; NDJSON streams every
+    matching log from the cursor onwards straight from the Motor cursor.
+    """
+    query = travel_filters(user_email, date_from, date_to)
+    projection = parse_fields(fields, always=TRAVEL_SORT_FIELDS)
+
+    if format == "ndjson":
+        return ndjson_response(find_from_cursor(travels_collection, query, TRAVEL_SORT_FIELDS, cursor, projection, limit))
+
+    logs, next_cursor = await fetch_page(
+        travels_collection, query, TRAVEL_SORT_FIELDS, limit or DEFAULT_PAGE_SIZE, cursor, projection
+    )
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return MongoJSONResponse(logs, headers=headers)
+
+# -------------------------
+# Employee: Add Travel Log
+# -------------------------
+async def _existing_submission(log_data: dict) -> Optional[dict]:
+    # Same Idempotency-Key already inserted (e.g. after the key store entry expired)
+    if "idempotency_key" not in log_data:
+        return None
+    existing = await travels_collection.find_one(
+        {"user_email": log_data["user_email"], "idempotency_key": log_data["idempotency_key"]},
+        {"_id": 1},
+    )
+    return {"msg": "✅ Travel log added", "id": str(existing["_id"])} if existing else None
+
+async def _insert_travel(log_data: dict) -> dict:
+    """
+    Reserve the odometer range first (atomic, rejects overlaps with 409),
+    then insert; the reservation is undone if the insert fails.
+    """
+    user_email, meter_end = log_data["user_email"], log_data["meter_end"]
+    try:
+        previous = await reserve_reading(user_email, log_data["meter_start"], meter_end)
+    except OdometerConflict as e:
+        existing = await _existing_submission(log_data)
+        if existing:
+            return existing
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        result = await travels_collection.insert_one(log_data)
+    except DuplicateKeyError:
+        await release_reading(user_email, meter_end, previous)
+        existing = await _existing_submission(log_data)
+        if existing:
+            return existing
+        raise HTTPException(status_code=409, detail="Travel log conflicts with an existing submission")
+    except Exception:
+        await release_reading(user_email, meter_end, previous)
+        raise
+
+    await apply_rollup(log_data)
     return {"msg": "✅ Travel log added", "id": str(result.inserted_id)}
 
+@router.post("/")
+async def add_travel(
+    log: TravelLogRequest,
+    idempotency_key: Optional[str] = Header(
+        None, alias=IDEMPOTENCY_KEY_HEADER, min_length=1, max_length=IDEMPOTENCY_KEY_MAX_LENGTH
+    ),
+    user=Depends(get_current_user),
+):
+    """
+    The trip must start at or after the user's last odometer reading
+    (409 otherwise). With an Idempotency-Key header, retries of the same
+    submission return the original result instead of inserting a second
+    log; reusing a key with a different body is rejected with 422.
+    """
+    try:
+        log_data = build_log_data(log, user["sub"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if idempotency_key is None:
+        return await _insert_travel(log_data)
+
+    stored = await idempotency_store.claim(user["sub"], idempotency_key, request_fingerprint(log.dict()))
+    if stored is not None:
+        return MongoJSONResponse(stored, headers={IDEMPOTENT_REPLAY_HEADER: "true"})
+
+    log_data["idempotency_key"] = idempotency_key
+    try:
+        response = await _insert_travel(log_data)
+    except Exception:
+        await idempotency_store.release(user["sub"], idempotency_key)
+        raise
+    await idempotency_store.complete(user["sub"], idempotency_key, response)
+    return response
+
+# -------------------------
+# Employee/Admin: Bulk Add Travel Logs
+# -------------------------
+async def _insert_batch(batch: list, rows: list, errors: RowErrors, readings: ReadingTracker) -> int:
+    """
+    Reserve each user's odometer range in the batch, then unordered
+    insert_many. Rows of a user whose range was taken by a concurrent
+    submission and failed documents are reported by row number; the
+    reservations are trimmed to what was inserted.
+    """
+    reservations, conflicts = await readings.reserve(batch)
+    docs, doc_rows = [], []
+    for log_data, row in zip(batch, rows):
+        if log_data["user_email"] in conflicts:
+            errors.add(row, str(conflicts[log_data["user_email"]]))
+        else:
+            docs.append(log_data)
+            doc_rows.append(row)
+
+    failed = set()
+    try:
+        if docs:
+            await travels_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed.add(err["index"])
+            errors.add(doc_rows[err["index"]], err.get("errmsg", "Write failed"))
+    except Exception:
+        await readings.settle(reservations, [])
+        raise
+
+    inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+    await readings.settle(reservations, inserted)
+    await apply_rollups(inserted)
+    return len(inserted)
+
+@router.post("/bulk")
+async def add_travels_bulk(
+    request: Request,
+    batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=BULK_MAX_BATCH_SIZE),
+    user=Depends(get_current_user),
+):
+    """
+    Accepts a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv)
+    body of travel logs. Each row is validated like a single submission
+    (rows of one user must be in odometer order) and valid rows are
+    written with unordered insert_many in batches. An optional `date`
+    column (YYYY-MM-DD, not in the future) backdates imported trips.
+    """
+    is_admin = user.get("role") == "admin"
+    readings = ReadingTracker()
+    errors = RowErrors()
+    inserted = 0
+    batch, batch_rows = [], []
+
+    async for number, row, error in iter_rows(request):
+        if error is None:
+            try:
+                log = BulkTravelLogRow(**row)
+                owner = log.user_email or user["sub"]
+                if owner != user["sub"] and not is_admin:
+                    raise ValueError("Only admins can add logs for other users")
+                log_data = build_log_data(log, owner, log.trip_date)
+                await readings.check(owner, log_data["meter_start"], log_data["meter_end"])
+                batch.append(log_data)
+                batch_rows.append(number)
+            except ValidationError as e:
+                error = format_validation_error(e)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            errors.add(number, error)
+
+        if len(batch) >= batch_size:
+            inserted += await _insert_batch(batch, batch_rows, errors, readings)
+            batch, batch_rows = [], []
+
+    if batch:
+        inserted += await _insert_batch(batch, batch_rows, errors, readings)
+
+    return {
+        "msg": f"✅ {inserted} travel logs added",
+        "inserted": inserted,
+        "failed": errors.count,
+        "errors": errors.report(),
+    }
+
 # -------------------------
 # Employee: View My Logs
 # -------------------------
 @router.get("/me")
 async def get_my_travels(user=Depends(get_current_user)):
     logs = await travels_collection.find({"user_email": user["sub"]}).to_list(500)
-    return [fix_ids(log) for log in logs]
+    return MongoJSONResponse(logs)
+
+# -------------------------
+# Employee: My Monthly Summary
+# -------------------------
+@router.get("/summary/me")
+async def get_my_summary(month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"), user=Depends(get_current_user)):
+    query = {"user_email": user["sub"]}
+    if month:
+        query["month"] = month
+    return MongoJSONResponse(await rollups_collection.find(query, {"_id": 0}).sort("month", 1).to_list(None))
 
 # -------------------------
 # Admin: View All Logs
 # -------------------------
 @router.get("/all")
-async def get_all_travels(user=Depends(role_required("admin"))):
-    logs = await travels_collection.find().to_list(5000)
-    return [fix_ids(log) for log in logs]
+async def get_all_travels(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user_email: Optional[str] = None,
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    fields: Optional[str] = Query(None, description="Comma-separated projection"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    user=Depends(role_required("admin")),
+):
+    return await list_travels(limit, cursor, user_email, date_from, date_to, fields, format)
+
+# -------------------------
+# Admin: Export Logs (CSV / XLSX)
+# -------------------------
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+@router.get("/export")
+async def export_travels(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    user_email: Optional[str] = None,
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    compress: Optional[str] = Query(None, pattern="^gzip$"),
+    user=Depends(role_required("admin")),
+):
+    """
+    Streams matching logs straight from the Motor cursor as CSV (optionally
+    gzipped on the fly) or XLSX. X-Total-Count carries the row count up
+    front so clients can show progress while the chunked body arrives.
+    """
+    if compress and format == "xlsx":
+        raise HTTPException(status_code=400, detail="XLSX files are already compressed")
+
+    query = travel_filters(user_email, date_from, date_to)
+    reporting = travels_reporting_collection
+    total = await reporting.count_documents(query) if query else await reporting.estimated_document_count()
+    documents = find_from_cursor(reporting, query, TRAVEL_SORT_FIELDS)
+
+    filename = f"travel_logs_{datetime.utcnow().strftime('%Y%m%d')}"
+    if format == "xlsx":
+        body, media_type, filename = iter_xlsx(documents), XLSX_MEDIA_TYPE, filename + ".xlsx"
+    else:
+        body, media_type, filename = iter_csv(documents), "text/csv; charset=utf-8", filename + ".csv"
+    if compress:
+        body, media_type, filename = gzip_stream(body), "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Total-Count": str(total),
+        },
+    )
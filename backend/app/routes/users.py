@@ -1,28 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from pydantic import BaseModel, EmailStr, Field
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import List, Optional
+from app.config import env_int, JWT_SECRET as SECRET_KEY, JWT_ALGORITHM as ALGORITHM
 from app.database import users_collection
-from app.utils import hash_password, verify_password, create_reset_token, verify_reset_token
+from app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+    parse_fields, fetch_page, find_from_cursor, ndjson_response,
+)
+from app.utils import hash_password_async, verify_password_async, create_reset_token, verify_reset_token
 from jose import jwt
 from datetime import datetime, timedelta
-import os, smtplib, ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
+import asyncio
 from app.auth import get_current_user, role_required
+from app.auth_events import auth_events
+from app.mailer import mail_queue
+from app.profile_cache import profile_cache
+from app.rate_limit import rate_limit, rate_limiter, client_ip
+from app.responses import MongoJSONResponse
 
-# Load environment
-load_dotenv()
-
-SECRET_KEY = os.getenv("JWT_SECRET", "supersecret")
-ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
-
-# Outlook config
-SMTP_SERVER = "smtp.office365.com"
-SMTP_PORT = 587
-OUTLOOK_EMAIL = os.getenv("OUTLOOK_EMAIL")
-OUTLOOK_PASSWORD = os.getenv("OUTLOOK_PASSWORD")
+# Most operations accepted by one POST /bulk request
+BULK_USERS_MAX = env_int("BULK_USERS_MAX", 1000)
 
 router = APIRouter()
 
@@ -52,6 +52,13 @@ class AdminUpdateUserRequest(BaseModel):
     fuel_card_no: Optional[str] = None
     role: Optional[str] = None
 
+class BulkUserOperation(AdminUpdateUserRequest):
+    op: str = Field(..., pattern="^(update|delete)$")
+    email: str
+
+class BulkUserRequest(BaseModel):
+    operations: List[BulkUserOperation] = Field(..., min_length=1, max_length=BULK_USERS_MAX)
+
 class ForgotPasswordRequest(BaseModel):
     email: EmailStr
 
@@ -60,14 +67,9 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 # -------------------------
-# Helper: Send reset email
+# Helper: Queue reset email
 # -------------------------
 def send_reset_email(email: str, reset_link: str):
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = "LogiTrack - Password Reset"
-    msg["From"] = OUTLOOK_EMAIL
-    msg["To"] = email
-
     html = f"""
     <html>
       <body>
@@ -80,18 +82,12 @@ def send_reset_email(email: str, reset_link: str):
     </html>
     """
 
-    msg.attach(MIMEText(html, "html"))
-
-    context = ssl.create_default_context()
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls(context=context)
-        server.login(OUTLOOK_EMAIL, OUTLOOK_PASSWORD)
-        server.sendmail(OUTLOOK_EMAIL, email, msg.as_string())
+    mail_queue.enqueue(email, "LogiTrack - Password Reset", html)
 
 # -------------------------
 # Register
 # -------------------------
-@router.post("/register")
+@router.post("/register", dependencies=[Depends(rate_limit("register"))])
 async def register_user(req: RegisterRequest):
     existing = await users_collection.find_one({"email": req.email})
     if existing:
@@ -100,7 +96,7 @@ async def register_user(req: RegisterRequest):
     user = {
         "name": req.name,
         "email": req.email,
-        "password": hash_password(req.password),
+        "password": await hash_password_async(req.password),
         "fuel_card_no": req.fuel_card_no,
         "role": "employee",
         "created_at": datetime.utcnow(),
@@ -111,11 +107,15 @@ async def register_user(req: RegisterRequest):
 # -------------------------
 # Login
 # -------------------------
-@router.post("/login", response_model=TokenResponse)
-async def login_user(req: LoginRequest):
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(rate_limit("login"))])
+async def login_user(req: LoginRequest, request: Request):
+    await rate_limiter.check("login", "email", req.email.lower())
     user = await users_collection.find_one({"email": req.email})
-    if not user or not verify_password(req.password, user["password"]):
+    if not user or not await verify_password_async(req.password, user["password"]):
+        reason = "unknown_user" if not user else "wrong_password"
+        auth_events.record("password_login", "failure", email=req.email, ip=client_ip(request), error=reason)
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    auth_events.record("password_login", "success", email=user["email"], ip=client_ip(request))
 
     to_encode = {
         "sub": user["email"],
@@ -128,8 +128,9 @@ async def login_user(req: LoginRequest):
 # -------------------------
 # Forgot Password
 # -------------------------
-@router.post("/forgot-password")
+@router.post("/forgot-password", dependencies=[Depends(rate_limit("forgot_password"))])
 async def forgot_password(req: ForgotPasswordRequest):
+    await rate_limiter.check("forgot_password", "email", req.email.lower())
     user = await users_collection.find_one({"email": req.email})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -139,8 +140,12 @@ async def forgot_password(req: ForgotPasswordRequest):
 
     try:
         send_reset_email(req.email, reset_link)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Email failed: {str(e)}")
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Email service busy, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
 
     return {"message": "Password reset link sent to your email"}
 
@@ -153,7 +158,7 @@ async def reset_password(req: ResetPasswordRequest):
     if not email:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    hashed_pw = hash_password(req.new_password)
+    hashed_pw = await hash_password_async(req.new_password)
     await users_collection.update_one(
         {"email": email},
         {"$set": {"password": hashed_pw}}
@@ -166,10 +171,16 @@ async def reset_password(req: ResetPasswordRequest):
 # -------------------------
 @router.get("/me")
 async def get_me(user=Depends(get_current_user)):
+    cached = await profile_cache.get(user["sub"])
+    if cached is not None:
+        return MongoJSONResponse(cached)
+
+    generation = await profile_cache.generation(user["sub"])
     db_user = await users_collection.find_one({"email": user["sub"]}, {"_id": 0, "password": 0})
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    await profile_cache.set(user["sub"], db_user, generation)
+    return MongoJSONResponse(db_user)
 
 # -------------------------
 # Update My Profile
@@ -184,6 +195,7 @@ async def update_profile(req: UpdateProfileRequest, user=Depends(get_current_use
         {"email": user["sub"]},
         {"$set": update_data}
     )
+    await profile_cache.invalidate(user["sub"])
 
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="No changes applied")
@@ -193,10 +205,36 @@ async def update_profile(req: UpdateProfileRequest, user=Depends(get_current_use
 # -------------------------
 # Admin: Get All Users
 # -------------------------
+USER_SORT_FIELDS = ["_id"]
+
 @router.get("/all")
-async def get_all_users(user=Depends(role_required("admin"))):
-    users = await users_collection.find({}, {"_id": 0, "password": 0}).to_list(1000)
-    return users
+async def get_all_users(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    role: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated projection"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    user=Depends(role_required("admin")),
+):
+    query = {"role": role} if role else {}
+    projection = parse_fields(fields, always=USER_SORT_FIELDS)
+    if projection:
+        projection.pop("password", None)
+    else:
+        projection = {"password": 0}
+
+    # _id is only fetched to build the cursor and is never returned
+    if format == "ndjson":
+        mongo_cursor = find_from_cursor(users_collection, query, USER_SORT_FIELDS, cursor, projection, limit)
+        return ndjson_response(mongo_cursor, drop_fields=("_id",))
+
+    users, next_cursor = await fetch_page(
+        users_collection, query, USER_SORT_FIELDS, limit or DEFAULT_PAGE_SIZE, cursor, projection
+    )
+    for u in users:
+        u.pop("_id", None)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return MongoJSONResponse(users, headers=headers)
 
 # -------------------------
 # Admin: Update User
@@ -211,6 +249,7 @@ async def admin_update_user(email: str, req: AdminUpdateUserRequest, user=Depend
         {"email": email},
         {"$set": update_data}
     )
+    await profile_cache.invalidate(email)
 
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
@@ -226,7 +265,78 @@ async def delete_user(email: str, user=Depends(role_required("admin"))):
         raise HTTPException(status_code=403, detail="Admins cannot delete themselves")
 
     result = await users_collection.delete_one({"email": email})
+    await profile_cache.invalidate(email)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
 
     return {"msg": f"🗑️ User {email} deleted successfully"}
+
+# -------------------------
+# Admin: Bulk Update / Delete Users
+# -------------------------
+@router.post("/bulk")
+async def bulk_update_users(req: BulkUserRequest, user=Depends(role_required("admin"))):
+    """
+    Apply many updates (including role changes) with one unordered
+    bulk_write, and deletions concurrently. Every operation gets its own
+    result, in request order, taken from the write results: updated,
+    deleted, not_found or error. Each email may appear once per request,
+    and admins still cannot delete themselves.
+    """
+    results = [{"email": item.email, "op": item.op} for item in req.operations]
+
+    updates, deletes, seen = [], [], set()
+    for position, item in enumerate(req.operations):
+        result = results[position]
+        update_data = {k: v for k, v in item.dict(exclude={"op", "email"}).items() if v is not None}
+        if item.email in seen:
+            result.update(status="error", error="Email appears more than once in this request")
+        elif item.op == "delete" and item.email == user["sub"]:
+            result.update(status="error", error="Admins cannot delete themselves")
+        elif item.op == "update" and not update_data:
+            result.update(status="error", error="No changes provided")
+        elif item.op == "delete":
+            deletes.append(position)
+        else:
+            updates.append((position, update_data))
+        seen.add(item.email)
+
+    if updates:
+        failed = {}
+        try:
+            outcome = await users_collection.bulk_write(
+                [UpdateOne({"email": results[p]["email"]}, {"$set": data}) for p, data in updates], ordered=False
+            )
+            matched = outcome.matched_count
+        except BulkWriteError as e:
+            failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+            matched = e.details.get("nMatched", 0)
+        for index, (position, _) in enumerate(updates):
+            if index in failed:
+                results[position].update(status="error", error=failed[index])
+        applied = [(p, data) for index, (p, data) in enumerate(updates) if index not in failed]
+
+        if matched == len(applied):
+            for position, _ in applied:
+                results[position]["status"] = "updated"
+        else:
+            # Some users are gone and the count cannot say which; $set is idempotent, so ask row by row
+            outcomes = await asyncio.gather(*[
+                users_collection.update_one({"email": results[p]["email"]}, {"$set": data}) for p, data in applied
+            ])
+            for (position, _), outcome in zip(applied, outcomes):
+                results[position]["status"] = "updated" if outcome.matched_count else "not_found"
+
+    if deletes:
+        outcomes = await asyncio.gather(*[users_collection.delete_one({"email": results[p]["email"]}) for p in deletes])
+        for position, outcome in zip(deletes, outcomes):
+            results[position]["status"] = "deleted" if outcome.deleted_count else "not_found"
+
+    changed = [r["email"] for r in results if r["status"] in ("updated", "deleted")]
+    if changed:
+        await profile_cache.invalidate(*changed)
+
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {"summary": summary, "results": results}
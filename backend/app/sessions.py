@@ -0,0 +1,253 @@
+import time
+import base64
+import asyncio
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from app.config import env, env_int, env_float, env_bool, JWT_SECRET
+from app.cache import TTLCache
+from app.database import sessions_collection
+from app.metrics import register_cache, registry
+from app.wso2_oidc import refresh_access_token
+
+# ---------------------------------------------------------------------
+# 🍪 Server-side WSO2 session config
+# ---------------------------------------------------------------------
+SESSION_COOKIE_NAME = env("SESSION_COOKIE_NAME", "ft_session")
+SESSION_COOKIE_SECURE = env_bool("SESSION_COOKIE_SECURE", True)
+SESSION_COOKIE_SAMESITE = env("SESSION_COOKIE_SAMESITE", "lax")
+# Absolute lifetime; keep it within WSO2's refresh token validity (86400s by default)
+SESSION_TTL_SECONDS = env_int("SESSION_TTL_SECONDS", 86400)
+# Access tokens are refreshed when they have less than this left
+SESSION_REFRESH_MARGIN = env_int("SESSION_REFRESH_MARGIN", 60)
+# How long one worker may hold the refresh lease before others take over
+SESSION_REFRESH_LEASE = env_int("SESSION_REFRESH_LEASE", 15)
+# Per-worker cache of decrypted sessions; a logout elsewhere is seen within this window
+SESSION_CACHE_TTL = env_float("SESSION_CACHE_TTL", 30)
+SESSION_CACHE_SIZE = env_int("SESSION_CACHE_SIZE", 10000)
+# Comma-separated Fernet keys; the first encrypts, all decrypt (for rotation)
+SESSION_ENCRYPTION_KEYS = env("SESSION_ENCRYPTION_KEYS", "")
+# Local development only: derive the key from JWT_SECRET when no keys are set
+SESSION_DEV_KEY = env_bool("SESSION_DEV_KEY", False)
+
+SESSION_REFRESHES = registry.counter("session_refreshes_total", "Access token refreshes by outcome", ["outcome"])
+
+
+def _load_cipher() -> Optional[MultiFernet]:
+    keys = [k.strip() for k in SESSION_ENCRYPTION_KEYS.split(",") if k.strip()]
+    if not keys:
+        if not SESSION_DEV_KEY:
+            print(
+                "⚠️ SESSION_ENCRYPTION_KEYS is not set; WSO2 sessions are disabled. Generate one with "
+                "python -c 'from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())' "
+                "(or set SESSION_DEV_KEY=true for local development)"
+            )
+            return None
+        print("⚠️ SESSION_DEV_KEY set; deriving the session key from JWT_SECRET")
+        secret = JWT_SECRET.encode()
+        keys = [base64.urlsafe_b64encode(hashlib.sha256(b"session-key:" + secret).digest()).decode()]
+    return MultiFernet([Fernet(key) for key in keys])
+
+
+def _session_key(session_id: str) -> str:
+    # Only a digest of the cookie value is stored, so a database leak yields no usable cookies
+    return hashlib.sha256(session_id.encode()).hexdigest()
+
+
+class SessionStore:
+    """
+    WSO2 tokens kept server-side behind an opaque cookie. Tokens are
+    encrypted at rest; access tokens are refreshed shortly before they
+    expire. Concurrent refreshes of one session share a single task in
+    this worker and a lease in MongoDB across workers, so WSO2 sees one
+    refresh call per expiry (and rotated refresh tokens are never reused).
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._cipher = None
+        self._cipher_loaded = False
+        self.cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+        self._refreshing = {}
+
+    @property
+    def cipher(self) -> MultiFernet:
+        # Built on first use, so the rest of the app runs without a session key
+        if not self._cipher_loaded:
+            self._cipher = _load_cipher()
+            self._cipher_loaded = True
+        if self._cipher is None:
+            raise HTTPException(status_code=503, detail="WSO2 sessions are not configured")
+        return self._cipher
+
+    def ensure_configured(self):
+        """Raise 503 when no session key is set."""
+        self.cipher
+
+    def _encrypt(self, value: str) -> bytes:
+        return self.cipher.encrypt(value.encode())
+
+    def _decrypt(self, value: bytes) -> str:
+        return self.cipher.decrypt(value).decode()
+
+    def _load(self, doc: dict) -> dict:
+        return {
+            "key": doc["_id"],
+            "user": doc["user"],
+            "access_token": self._decrypt(doc["access_token"]),
+            "access_expires_at": doc["access_expires_at"],
+            "expires_at": doc["expires_at"],
+            "refreshable": "refresh_token" in doc,
+            "version": doc["version"],
+        }
+
+    def _cache(self, session: dict):
+        # Never serve a cached access token past the point it needs refreshing
+        self.cache.set(session["key"], session, expires_at=session["access_expires_at"] - SESSION_REFRESH_MARGIN)
+
+    @staticmethod
+    def _token_fields(token_data: dict) -> dict:
+        return {"access_expires_at": time.time() + int(token_data.get("expires_in", 3600))}
+
+    async def create(self, token_data: dict, user: dict) -> str:
+        session_id = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        doc = {
+            "_id": _session_key(session_id),
+            "user": user,
+            "access_token": self._encrypt(token_data["access_token"]),
+            **self._token_fields(token_data),
+            "version": 0,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=SESSION_TTL_SECONDS),
+        }
+        if token_data.get("refresh_token"):
+            doc["refresh_token"] = self._encrypt(token_data["refresh_token"])
+        if token_data.get("id_token"):
+            doc["id_token"] = self._encrypt(token_data["id_token"])
+        await self.collection.insert_one(doc)
+        return session_id
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        """
+        Return the session with an access token valid for at least
+        SESSION_REFRESH_MARGIN seconds, or None if it does not exist or
+        can no longer be refreshed.
+        """
+        key = _session_key(session_id)
+        session = self.cache.get(key)
+        if session is None:
+            doc = await self.collection.find_one({"_id": key})
+            if doc is None or doc["expires_at"] <= datetime.utcnow():
+                return None
+            try:
+                session = self._load(doc)
+            except InvalidToken:
+                # Encrypted with a key that is no longer configured
+                return None
+
+        if session["access_expires_at"] - time.time() > SESSION_REFRESH_MARGIN:
+            self._cache(session)
+            return session
+        if not session["refreshable"]:
+            return session if session["access_expires_at"] > time.time() else None
+        return await self._refresh(session)
+
+    async def _refresh(self, session: dict) -> Optional[dict]:
+        key = session["key"]
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh_with_lease(session))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+        else:
+            SESSION_REFRESHES.inc("coalesced")
+        # Shielded so a client disconnecting does not cancel the refresh for everyone else
+        return await asyncio.shield(task)
+
+    async def _refresh_with_lease(self, session: dict) -> Optional[dict]:
+        key = session["key"]
+        deadline = time.monotonic() + SESSION_REFRESH_LEASE
+        while True:
+            now = time.time()
+            doc = await self.collection.find_one_and_update(
+                {
+                    "_id": key,
+                    "version": session["version"],
+                    "$or": [{"lease_until": {"$exists": False}}, {"lease_until": {"$lt": now}}],
+                },
+                {"$set": {"lease_until": now + SESSION_REFRESH_LEASE}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is not None:
+                return await self._do_refresh(doc)
+
+            # Another worker refreshed already or holds the lease
+            doc = await self.collection.find_one({"_id": key})
+            if doc is None:
+                return None
+            if doc["version"] != session["version"]:
+                SESSION_REFRESHES.inc("coalesced")
+                session = self._load(doc)
+                self._cache(session)
+                return session
+            if time.monotonic() >= deadline:
+                raise HTTPException(status_code=503, detail="Session refresh in progress, please retry", headers={"Retry-After": "1"})
+            await asyncio.sleep(0.1)
+
+    async def _do_refresh(self, doc: dict) -> Optional[dict]:
+        key = doc["_id"]
+        try:
+            token_data = await refresh_access_token(self._decrypt(doc["refresh_token"]))
+        except HTTPException as e:
+            if e.status_code in (400, 401):
+                # invalid_grant: the refresh token was revoked or has expired
+                SESSION_REFRESHES.inc("rejected")
+                await self.delete_key(key)
+                return None
+            SESSION_REFRESHES.inc("failed")
+            await self.collection.update_one({"_id": key}, {"$unset": {"lease_until": ""}})
+            raise
+
+        update = {"access_token": self._encrypt(token_data["access_token"]), **self._token_fields(token_data)}
+        if token_data.get("refresh_token"):
+            update["refresh_token"] = self._encrypt(token_data["refresh_token"])
+        if token_data.get("id_token"):
+            update["id_token"] = self._encrypt(token_data["id_token"])
+
+        doc = await self.collection.find_one_and_update(
+            {"_id": key},
+            {"$set": update, "$inc": {"version": 1}, "$unset": {"lease_until": ""}},
+            return_document=ReturnDocument.AFTER,
+        )
+        SESSION_REFRESHES.inc("refreshed")
+        if doc is None:
+            return None
+        session = self._load(doc)
+        self._cache(session)
+        return session
+
+    async def delete(self, session_id: str) -> Optional[str]:
+        """
+        Remove the session and return its refresh token (if any) so the
+        caller can revoke it at WSO2.
+        """
+        doc = await self.delete_key(_session_key(session_id))
+        if doc and "refresh_token" in doc:
+            try:
+                return self._decrypt(doc["refresh_token"])
+            except InvalidToken:
+                return None
+        return None
+
+    async def delete_key(self, key: str) -> Optional[dict]:
+        self.cache.delete(key)
+        return await self.collection.find_one_and_delete({"_id": key})
+
+
+session_store = SessionStore(sessions_collection)
+register_cache("session", session_store.cache)
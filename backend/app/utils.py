@@ -1,17 +1,22 @@
 from passlib.context import CryptContext
-from jose import jwt
+from jose import jwt, JWTError
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
+import asyncio
 import os
-from dotenv import load_dotenv
-
-
-
-load_dotenv()
+from app.config import env, env_int, RESET_SECRET, JWT_SECRET as SECRET_KEY, JWT_ALGORITHM as ALGORITHM
+from app.metrics import registry, track_dependency
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-SECRET_KEY = os.getenv("JWT_SECRET", "supersecret")
-ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+RESET_EXPIRE_MINUTES = 15
+
+# Password hashing pool: "thread" (bcrypt releases the GIL) or "process"
+PASSWORD_HASH_EXECUTOR = env("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = env_int("PASSWORD_HASH_WORKERS", os.cpu_count() or 2)
+PASSWORD_HASH_MAX_QUEUE = env_int("PASSWORD_HASH_MAX_QUEUE", 32)
+PASSWORD_HASH_RETRY_AFTER = env_int("PASSWORD_HASH_RETRY_AFTER", 1)
 
 # -------------------------
 # Password hashing helpers
@@ -23,34 +28,59 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 # -------------------------
-# JWT helpers
+# Off-loop password hashing
 # -------------------------
-def create_access_token(data: dict, expires_delta: int = 60):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=expires_delta)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-
-
-
-load_dotenv()
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-SECRET_KEY = os.getenv("JWT_SECRET", "supersecret")
-ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-
-RESET_SECRET = os.getenv("RESET_SECRET", "resetsecret")
-RESET_EXPIRE_MINUTES = 15
-
-# -------------------------
-# Password hashing helpers
-# -------------------------
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+_hash_executor = None
+_hash_pending = 0
+
+def _get_hash_executor():
+    global _hash_executor
+    if _hash_executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+            )
+    return _hash_executor
+
+async def _run_hasher(func, *args):
+    """
+    Run a bcrypt call on the worker pool. Admission is bounded to the
+    number of workers plus PASSWORD_HASH_MAX_QUEUE waiting jobs; beyond
+    that the request is shed with 503 instead of queueing without limit.
+    """
+    global _hash_pending
+    if _hash_pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+        )
+
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        with track_dependency("bcrypt", func.__name__):
+            return await loop.run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        _hash_pending -= 1
+
+registry.gauge(
+    "bcrypt_pending_jobs", "Password hashing jobs running or queued", function=lambda: {(): _hash_pending}
+)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher(hash_password, password)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_hasher(verify_password, plain, hashed)
+
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
 
 # -------------------------
 # JWT helpers
@@ -0,0 +1,111 @@
+import time
+import asyncio
+from app.config import env_bool, env_int, env_float
+from app.database import db, MONGO_MIN_POOL_SIZE, MONGO_MAX_POOL_SIZE
+from app.jwks import jwks_cache
+from app.utils import verify_password_async, PASSWORD_HASH_WORKERS
+from app.wso2_oidc import get_jwks, MAX_KEEPALIVE
+
+# ---------------------------------------------------------------------
+# 🔥 Startup warmup config
+# ---------------------------------------------------------------------
+WARMUP_ENABLED = env_bool("WARMUP_ENABLED", True)
+# Per step; a step that times out is reported and the worker still becomes ready
+WARMUP_TIMEOUT = env_float("WARMUP_TIMEOUT", 30)
+# MongoDB connections opened up front (at least MONGO_MIN_POOL_SIZE, which keeps them open)
+WARMUP_MONGO_CONNECTIONS = env_int("WARMUP_MONGO_CONNECTIONS", 10)
+# Keep-alive connections opened to WSO2
+WARMUP_WSO2_CONNECTIONS = env_int("WARMUP_WSO2_CONNECTIONS", 4)
+
+# bcrypt hash of "warmup" at cost 4: loads the backend and starts each hashing worker in about a millisecond
+_WARMUP_HASH = "$2b$04$Zhe5hBLVKFzLrE58g6VXtOHAixefU9U/3YqwSLhZ/y3CpTaFvhVUW"
+
+
+class Warmup:
+    """
+    Pays the cold-start costs before traffic arrives: open MongoDB pool
+    connections, start the password hashing workers and open pooled
+    connections to WSO2 (fetching the signing keys on the way). Steps run
+    concurrently; failures are recorded rather than raised, so a slow
+    dependency delays readiness by at most WARMUP_TIMEOUT.
+    """
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+        self.steps = {}
+        self.duration_ms = None
+        self._task = None
+
+    async def _mongodb(self) -> dict:
+        connections = max(MONGO_MIN_POOL_SIZE, WARMUP_MONGO_CONNECTIONS)
+        if MONGO_MAX_POOL_SIZE:
+            connections = min(connections, MONGO_MAX_POOL_SIZE)
+        # Overlapping pings each check out their own connection
+        await asyncio.gather(*[db.command("ping") for _ in range(connections)])
+        return {"connections": connections}
+
+    async def _bcrypt(self) -> dict:
+        await asyncio.gather(*[verify_password_async("warmup", _WARMUP_HASH) for _ in range(PASSWORD_HASH_WORKERS)])
+        return {"workers": PASSWORD_HASH_WORKERS}
+
+    async def _wso2(self) -> dict:
+        connections = max(1, min(WARMUP_WSO2_CONNECTIONS, MAX_KEEPALIVE))
+        await asyncio.gather(jwks_cache.refresh(), *[get_jwks() for _ in range(connections - 1)])
+        return {"connections": connections}
+
+    async def _step(self, name: str, step):
+        start = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(step(), WARMUP_TIMEOUT)
+            self.steps[name] = {"ok": True, **detail}
+        except Exception as e:
+            print(f"⚠️ Warmup of {name} failed:", repr(e))
+            self.steps[name] = {"ok": False, "error": str(e) or type(e).__name__}
+        self.steps[name]["ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    async def run(self):
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(
+                self._step("mongodb", self._mongodb),
+                self._step("bcrypt", self._bcrypt),
+                self._step("wso2", self._wso2),
+            )
+        finally:
+            self.duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.ready.set()
+        print(f"🔥 Warmup finished in {self.duration_ms} ms")
+
+    def start(self):
+        if not WARMUP_ENABLED:
+            self.ready.set()
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait(self, timeout: float = None) -> bool:
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def status(self) -> dict:
+        return {
+            "enabled": WARMUP_ENABLED,
+            "ready": self.ready.is_set(),
+            "duration_ms": self.duration_ms,
+            "steps": self.steps,
+        }
+
+
+warmup = Warmup()
@@ -1,43 +1,115 @@
-import os
-import requests
-from requests.auth import HTTPBasicAuth
+import asyncio
+import random
+import httpx
 from fastapi import HTTPException
-from dotenv import load_dotenv
-import urllib3
-
-# 🚫 Disable SSL warnings for self-signed WSO2 certs (only for localhost dev)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-load_dotenv()
+from app.config import env, env_int, env_float, env_bool
+from app.metrics import track_dependency
+from app.auth_events import auth_events
 
 # ---------------------------------------------------------------------
 # 🔐 WSO2 Configuration
 # ---------------------------------------------------------------------
-CLIENT_ID = os.getenv("WSO2_CLIENT_ID", "XmlbpXheBrnG8BcrsEO9bEJGzXIa")
-CLIENT_SECRET = os.getenv("WSO2_CLIENT_SECRET", "_cADO07sjDZUR0YRogXhU9lYyST_XUN7FrOd5i2uriwa")
-TOKEN_URL = os.getenv("WSO2_TOKEN_URL", "https://localhost:9443/oauth2/token")
-USERINFO_URL = os.getenv("WSO2_USERINFO_URL", "https://localhost:9443/oauth2/userinfo")
+CLIENT_ID = env("WSO2_CLIENT_ID", "XmlbpXheBrnG8BcrsEO9bEJGzXIa")
+CLIENT_SECRET = env("WSO2_CLIENT_SECRET", "_cADO07sjDZUR0YRogXhU9lYyST_XUN7FrOd5i2uriwa")
+TOKEN_URL = env("WSO2_TOKEN_URL", "https://localhost:9443/oauth2/token")
+USERINFO_URL = env("WSO2_USERINFO_URL", "https://localhost:9443/oauth2/userinfo")
+JWKS_URL = env("WSO2_JWKS_URL", "https://localhost:9443/oauth2/jwks")
+REVOKE_URL = env("WSO2_REVOKE_URL", "https://localhost:9443/oauth2/revoke")
 
 # ---------------------------------------------------------------------
-# 🧠 Track used authorization codes to prevent reuse errors
+# ⚙️ Outbound HTTP tuning
 # ---------------------------------------------------------------------
-used_codes = set()
+# 🚫 Self-signed WSO2 certs are the default for localhost dev
+VERIFY_SSL = env_bool("WSO2_VERIFY_SSL", False)
+MAX_CONNECTIONS = env_int("WSO2_MAX_CONNECTIONS", 50)
+MAX_KEEPALIVE = env_int("WSO2_MAX_KEEPALIVE", 20)
+MAX_CONCURRENCY = env_int("WSO2_MAX_CONCURRENCY", 32)
+TOKEN_TIMEOUT = env_float("WSO2_TOKEN_TIMEOUT", 10)
+USERINFO_TIMEOUT = env_float("WSO2_USERINFO_TIMEOUT", 5)
+JWKS_TIMEOUT = env_float("WSO2_JWKS_TIMEOUT", 5)
+CONNECT_TIMEOUT = env_float("WSO2_CONNECT_TIMEOUT", 3)
+MAX_RETRIES = env_int("WSO2_MAX_RETRIES", 2)
+RETRY_BACKOFF = env_float("WSO2_RETRY_BACKOFF", 0.2)
+
+RETRYABLE_STATUS = {502, 503, 504}
+
+_client = None
+_semaphore = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Shared keep-alive connection pool for every call to WSO2.
+    Created lazily so it binds to the running event loop.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            verify=VERIFY_SSL,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(TOKEN_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _send(operation: str, method: str, url: str, timeout: float, idempotent: bool, **kwargs) -> httpx.Response:
+    """
+    Send a request to WSO2 with bounded concurrency and retry with backoff.
+
+    Non-idempotent calls (the code exchange) are only retried when the
+    connection could not be opened, because a code is single-use and a
+    request that reached WSO2 must never be replayed.
+    """
+    client = get_http_client()
+    request_timeout = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+
+    attempt = 0
+    while True:
+        try:
+            async with _get_semaphore():
+                with track_dependency("wso2", operation):
+                    response = await client.request(method, url, timeout=request_timeout, **kwargs)
+            if idempotent and response.status_code in RETRYABLE_STATUS and attempt < MAX_RETRIES:
+                raise httpx.HTTPStatusError("retryable status", request=response.request, response=response)
+            return response
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            if attempt >= MAX_RETRIES:
+                raise
+        except (httpx.ReadTimeout, httpx.RemoteProtocolError, httpx.HTTPStatusError):
+            if not idempotent or attempt >= MAX_RETRIES:
+                raise
+
+        # 🔁 Exponential backoff with jitter
+        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+        attempt += 1
 
 # ---------------------------------------------------------------------
 # 🧩 Exchange authorization code for tokens
 # ---------------------------------------------------------------------
-def exchange_code_for_token(code: str, redirect_uri: str):
+async def exchange_code_for_token(code: str, redirect_uri: str):
     """
     Exchange the authorization code for access and ID tokens.
-    Ensures each authorization code is used only once (WSO2 rule).
+    Callers must claim the code in the replay store first (WSO2 rule:
+    each authorization code is used only once).
     """
 
-    global used_codes
-
-    # ✅ Prevent code reuse (WSO2 will reject reused codes)
-    if code in used_codes:
-        raise HTTPException(status_code=400, detail="Authorization code already used")
-
     data = {
         "grant_type": "authorization_code",
         "code": code,
@@ -46,65 +118,131 @@ def exchange_code_for_token(code: str, redirect_uri: str):
 
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
 
-    print("\n🔁 --- Sending Token Request to WSO2 ---")
-    print("📡 Endpoint:", TOKEN_URL)
-    print("📦 Form Data:", data)
-    print("🔑 Using CLIENT_ID:", CLIENT_ID)
-    print("----------------------------------------")
-
     try:
-        response = requests.post(
+        response = await _send(
+            "token",
+            "POST",
             TOKEN_URL,
+            TOKEN_TIMEOUT,
+            idempotent=False,
             data=data,
             headers=headers,
-            auth=HTTPBasicAuth(CLIENT_ID, CLIENT_SECRET),
-            verify=False,  # ✅ Ignore SSL warnings for localhost
-            timeout=15,
+            auth=(CLIENT_ID, CLIENT_SECRET),
         )
 
-        print("📥 WSO2 Response Status:", response.status_code)
-        print("📄 WSO2 Response Body:", response.text)
-        print("----------------------------------------\n")
-
         # ✅ If successful
         if response.status_code == 200:
-            used_codes.add(code)  # mark code as used
-            print("✅ Token exchange successful\n")
             return response.json()
 
         # ❌ Handle bad responses gracefully
+        auth_events.record("token_exchange", "failure", code=code, status=response.status_code, error=response.text)
         raise HTTPException(
             status_code=response.status_code,
             detail=f"Token exchange failed: {response.text}",
         )
 
-    except requests.exceptions.RequestException as e:
-        print("❌ Network error during token request:", str(e))
+    except HTTPException:
+        raise
+
+    except httpx.TimeoutException:
+        auth_events.record("token_exchange", "failure", code=code, error="timeout")
+        raise HTTPException(status_code=504, detail="WSO2 token endpoint timed out")
+
+    except httpx.HTTPError as e:
+        auth_events.record("token_exchange", "failure", code=code, error=str(e) or type(e).__name__)
         raise HTTPException(status_code=500, detail="WSO2 server unreachable")
 
     except Exception as e:
-        print("❌ Exception during token request:", str(e))
+        auth_events.record("token_exchange", "failure", code=code, error=str(e) or type(e).__name__)
         raise HTTPException(status_code=400, detail=f"Token request error: {str(e)}")
 
 # ---------------------------------------------------------------------
 # 👤 Fetch user info using access token
 # ---------------------------------------------------------------------
-def get_userinfo(access_token: str):
+async def get_userinfo(access_token: str):
     """
     Retrieve user profile info from WSO2 /userinfo endpoint.
     """
     headers = {"Authorization": f"Bearer {access_token}"}
 
-    print("🔍 Fetching user info from:", USERINFO_URL)
+    try:
+        response = await _send("userinfo", "GET", USERINFO_URL, USERINFO_TIMEOUT, idempotent=True, headers=headers)
+    except httpx.TimeoutException:
+        auth_events.record("userinfo", "failure", error="timeout")
+        raise HTTPException(status_code=504, detail="WSO2 userinfo endpoint timed out")
+    except httpx.HTTPError as e:
+        auth_events.record("userinfo", "failure", error=str(e) or type(e).__name__)
+        raise HTTPException(status_code=500, detail="WSO2 server unreachable")
 
-    response = requests.get(USERINFO_URL, headers=headers, verify=False)
+    if response.status_code != 200:
+        auth_events.record("userinfo", "failure", status=response.status_code, error=response.text)
+        raise HTTPException(status_code=response.status_code, detail=response.text)
 
-    print("📥 User Info Status:", response.status_code)
-    print("📄 User Info Response:", response.text)
+    return response.json()
+
+# ---------------------------------------------------------------------
+# 🔄 Refresh an access token
+# ---------------------------------------------------------------------
+async def refresh_access_token(refresh_token: str):
+    """
+    Trade a refresh token for a new access token. WSO2 may rotate the
+    refresh token, so the request is never replayed once it reached WSO2.
+    """
+    data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+    try:
+        response = await _send(
+            "refresh",
+            "POST",
+            TOKEN_URL,
+            TOKEN_TIMEOUT,
+            idempotent=False,
+            data=data,
+            headers=headers,
+            auth=(CLIENT_ID, CLIENT_SECRET),
+        )
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="WSO2 token endpoint timed out")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=500, detail="WSO2 server unreachable")
 
     if response.status_code != 200:
-        print("❌ Failed to fetch user info:", response.status_code, response.text)
-        raise HTTPException(status_code=response.status_code, detail=response.text)
+        auth_events.record("token_refresh", "failure", status=response.status_code, error=response.text)
+        raise HTTPException(status_code=response.status_code, detail=f"Token refresh failed: {response.text}")
+    return response.json()
 
-    print("✅ User info fetched successfully\n")
+# ---------------------------------------------------------------------
+# 🚪 Revoke a token on logout
+# ---------------------------------------------------------------------
+async def revoke_token(token: str, token_type_hint: str = "refresh_token"):
+    """
+    Best effort: the local session is gone either way, so failures are
+    only logged.
+    """
+    try:
+        response = await _send(
+            "revoke",
+            "POST",
+            REVOKE_URL,
+            TOKEN_TIMEOUT,
+            idempotent=True,
+            data={"token": token, "token_type_hint": token_type_hint},
+            auth=(CLIENT_ID, CLIENT_SECRET),
+        )
+        if response.status_code != 200:
+            auth_events.record("token_revocation", "failure", status=response.status_code)
+    except httpx.HTTPError as e:
+        auth_events.record("token_revocation", "failure", error=str(e) or type(e).__name__)
+
+# ---------------------------------------------------------------------
+# 🔑 Fetch signing keys (JWKS) used to sign ID tokens
+# ---------------------------------------------------------------------
+async def get_jwks():
+    """
+    Retrieve the JSON Web Key Set from WSO2 /jwks endpoint.
+    Network errors propagate so the caller can keep its cached keys.
+    """
+    response = await _send("jwks", "GET", JWKS_URL, JWKS_TIMEOUT, idempotent=True)
+    response.raise_for_status()
     return response.json()
@@ -0,0 +1,246 @@
+"""
+Benchmark harness: runs scripted load scenarios against the app in-process
+(ASGI transport, no network hop to uvicorn) with local stand-ins for
+MongoDB, WSO2 and SMTP.
+
+    python -m benchmarks --mongomock
+    python -m benchmarks --mongo-url mongodb://localhost:27017 --logs 100000
+    python -m benchmarks --mongomock --save baseline.json
+    python -m benchmarks --mongomock --baseline baseline.json --threshold 0.2
+
+Run from the backend directory. Exits with status 1 when a scenario fails
+its correctness check or regresses against the baseline.
+"""
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+import platform
+from datetime import datetime
+from benchmarks.coldstart import COLD_START, COLD_START_DESCRIPTION, cold_starts
+from benchmarks.fixtures import ADMIN_EMAIL, BENCH_PASSWORD, configure_mongo, reset_database, seed, user_email
+from benchmarks.runner import compare, drive, format_table, summarize
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.stubs import SMTPSink, StubWSO2
+
+# Limits a single benchmark client would trip immediately
+RATE_LIMIT_ENV = [
+    "RATE_LIMIT_LOGIN_IP", "RATE_LIMIT_LOGIN_EMAIL", "RATE_LIMIT_REGISTER_IP",
+    "RATE_LIMIT_FORGOT_PASSWORD_IP", "RATE_LIMIT_FORGOT_PASSWORD_EMAIL",
+    "RATE_LIMIT_OIDC_CALLBACK_IP", "RATE_LIMIT_OIDC_CALLBACK_CLIENT_ID",
+]
+
+# mongomock checks unique indexes by scanning the collection on every
+# insert, so its defaults stay small enough to finish in a few minutes
+DEFAULTS = {
+    "mongod": {
+        "requests": 500, "warmup": 50, "users": 100, "logs": 10000, "bulk_size": 100, "cold_starts": 5,
+        "analytics_metrics": "totals,top_drivers,trend,trip_length",
+    },
+    # mongomock lacks $dateTrunc and $percentile
+    "mongomock": {
+        "requests": 100, "warmup": 10, "users": 20, "logs": 1000, "bulk_size": 20, "cold_starts": 3,
+        "analytics_metrics": "totals,top_drivers",
+    },
+}
+
+
+class BenchContext:
+    def __init__(self, args, client, wso2: StubWSO2, smtp: SMTPSink):
+        from app.utils import create_access_token
+
+        self.client = client
+        self.wso2 = wso2
+        self.smtp = smtp
+        self.rng = random.Random(args.seed)
+        self.warmup = args.warmup
+        self.requests = args.requests
+        self.concurrency = args.concurrency
+        self.users = args.users
+        self.bulk_size = args.bulk_size
+        self.page_size = args.page_size
+        self.max_pages = args.max_pages
+        self.race_fanout = args.race_fanout
+        self.sessions = args.sessions
+        self.analytics_metrics = args.analytics_metrics
+        self.admin_headers = {"Authorization": "Bearer " + create_access_token({"sub": ADMIN_EMAIL, "role": "admin"}, 24 * 60)}
+        self._employee_headers = [
+            {"Authorization": "Bearer " + create_access_token({"sub": user_email(i), "role": "employee"}, 24 * 60)}
+            for i in range(args.users)
+        ]
+
+        # Odometer readings handed out per employee, above anything seeded
+        self._readings = {}
+        self._drivers = {}
+
+    def employee_headers(self, i: int) -> dict:
+        return self._employee_headers[i % self.users]
+
+    def next_trip(self, i: int, km: float) -> float:
+        """Start reading for employee `i`'s next trip of `km`."""
+        start = self._readings.get(i % self.users, 1_000_000.0)
+        self._readings[i % self.users] = start + km
+        return start
+
+    def driver(self, i: int) -> asyncio.Lock:
+        # One employee submits trips one after another; concurrency comes from many employees
+        return self._drivers.setdefault(i % self.users, asyncio.Lock())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="FuelTrackr backend benchmarks")
+    parser.add_argument("--scenarios", default="all", help="Comma-separated scenario names (default: all)")
+    parser.add_argument("--list", action="store_true", help="List scenarios and exit")
+    parser.add_argument("--requests", type=int, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, help="Unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    mongo = parser.add_mutually_exclusive_group()
+    mongo.add_argument("--mongo-url", default=os.getenv("BENCH_MONGO_URL"), help="Local mongod (uses the fueltrackr_bench database)")
+    mongo.add_argument("--mongomock", action="store_true", help="Use mongomock-motor instead of a mongod")
+    parser.add_argument("--users", type=int, help="Seeded employees")
+    parser.add_argument("--logs", type=int, help="Seeded travel logs")
+    parser.add_argument("--bulk-size", type=int, help="Rows per ingest_bulk / admin_users_bulk request")
+    parser.add_argument("--page-size", type=int, default=500, help="Page size for admin_listing")
+    parser.add_argument("--max-pages", type=int, default=50, help="Distinct pages admin_listing cycles through")
+    parser.add_argument("--race-fanout", type=int, default=8, help="Requests sharing each key in idempotency_race")
+    parser.add_argument("--sessions", type=int, default=10, help="WSO2 sessions refreshed in session_storm")
+    parser.add_argument("--analytics-metrics", help="metrics= for admin_analytics")
+    parser.add_argument("--cold-starts", type=int, help="Fresh worker processes measured by cold_start")
+    parser.add_argument("--no-warmup", action="store_true", help="Run with WARMUP_ENABLED=false (compare cold_start with and without)")
+    parser.add_argument("--wso2-latency-ms", type=float, default=0.0, help="Artificial latency of the stub WSO2")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="Write results as JSON (usable as a baseline)")
+    parser.add_argument("--baseline", help="Compare against a saved results file")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change flagged as a regression")
+    args = parser.parse_args(argv)
+
+    profile = DEFAULTS["mongomock" if args.mongomock else "mongod"]
+    for option, value in profile.items():
+        if getattr(args, option) is None:
+            setattr(args, option, value)
+    return args
+
+
+async def run(args, names: list, wso2: StubWSO2, smtp: SMTPSink) -> dict:
+    import httpx
+    from app.main import app
+    from app.wso2_oidc import CLIENT_ID
+    from app.warmup import warmup
+
+    wso2.client_id = CLIENT_ID
+    await reset_database()
+    await app.router.startup()
+    # Load balancers hold traffic until /health is ready; so does the harness
+    await warmup.wait()
+    try:
+        print(f"🌱 Seeding {args.users} users and {args.logs} travel logs...")
+        await seed(args.users, args.logs, random.Random(args.seed))
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            ctx = BenchContext(args, client, wso2, smtp)
+            results = {}
+            for name in names:
+                if name == COLD_START:
+                    continue
+                scenario = SCENARIOS[name]()
+                await scenario.setup(ctx)
+                try:
+                    print(f"🏃 {name}: {scenario.description}")
+                    await drive(lambda i: scenario.request(ctx, i), args.warmup, args.concurrency)
+                    measured = await drive(lambda i: scenario.request(ctx, i), args.requests, args.concurrency, offset=args.warmup)
+                    results[name] = summarize(measured, scenario.items_per_request)
+                    results[name]["problems"] = await scenario.verify(ctx)
+                    results[name]["details"] = await scenario.report(ctx)
+                finally:
+                    await scenario.teardown(ctx)
+
+        if COLD_START in names:
+            from app.utils import hash_password
+            print(f"🏃 {COLD_START}: {COLD_START_DESCRIPTION}")
+            results.update(await cold_starts(args.cold_starts, args.mongomock, hash_password(BENCH_PASSWORD)))
+        return results
+    finally:
+        await app.router.shutdown()
+        await reset_database()
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.list:
+        for name, cls in SCENARIOS.items():
+            print(f"{name:22} {cls.description}")
+        print(f"{COLD_START:22} {COLD_START_DESCRIPTION}")
+        return 0
+
+    names = [*SCENARIOS, COLD_START] if args.scenarios == "all" else [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS and n != COLD_START]
+    if unknown:
+        print("❌ Unknown scenarios:", ", ".join(unknown))
+        return 2
+    if not args.mongo_url and not args.mongomock:
+        print("❌ Pass --mongo-url (or set BENCH_MONGO_URL) or --mongomock")
+        return 2
+
+    # Everything below must be configured before `app` is imported
+    wso2 = StubWSO2(client_id=None, latency_ms=args.wso2_latency_ms)
+    smtp = SMTPSink()
+    configure_mongo(None if args.mongomock else args.mongo_url)
+    os.environ.update(wso2.env())
+    os.environ.update(smtp.env())
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+    if not os.getenv("SESSION_ENCRYPTION_KEYS"):
+        from cryptography.fernet import Fernet
+        os.environ["SESSION_ENCRYPTION_KEYS"] = Fernet.generate_key().decode()
+    for name in RATE_LIMIT_ENV:
+        os.environ.setdefault(name, "off")
+    if args.no_warmup:
+        os.environ["WARMUP_ENABLED"] = "false"
+
+    wso2.start()
+    smtp.start()
+    try:
+        results = asyncio.run(run(args, names, wso2, smtp))
+    finally:
+        wso2.stop()
+        smtp.stop()
+
+    print()
+    print(format_table(results))
+    failed = any(r["problems"] for r in results.values())
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "meta": {
+                    "created_at": datetime.utcnow().isoformat(),
+                    "python": platform.python_version(),
+                    "mongo": "mongomock" if args.mongomock else "mongod",
+                    "requests": args.requests,
+                    "concurrency": args.concurrency,
+                    "users": args.users,
+                    "logs": args.logs,
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"\n💾 Results saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions vs {args.baseline} (threshold {args.threshold:.0%}):")
+            for regression in regressions:
+                print("  -", regression)
+            failed = True
+        else:
+            print(f"\n✅ No regressions vs {args.baseline} (threshold {args.threshold:.0%})")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+One cold start of the app, measured in a fresh interpreter:
+
+    python -m benchmarks.coldstart [--mongomock]
+
+Prints a JSON line with the import time, the startup handler time, the
+time until warmup reported ready, and the latency of the first login and
+the first authenticated read. The parent harness runs this several times
+(WSO2, SMTP and MongoDB settings are inherited from its environment).
+"""
+import sys
+import time
+import json
+import asyncio
+
+STARTED = time.perf_counter()
+
+
+async def measure(mongomock: bool) -> dict:
+    t0 = time.perf_counter()
+    from app.main import app
+    from app.warmup import warmup
+    imported = time.perf_counter()
+
+    await app.router.startup()
+    started = time.perf_counter()
+    await warmup.wait()
+    ready = time.perf_counter()
+
+    import httpx
+    from benchmarks.fixtures import BENCH_PASSWORD, user_email
+
+    if mongomock:
+        # In-memory database: give this process its own user (hash computed by the parent)
+        from app.database import users_collection
+        await users_collection.insert_one({
+            "name": "Cold Start", "email": user_email(0), "password": sys.argv[sys.argv.index("--mongomock") + 1],
+            "fuel_card_no": "0", "role": "employee",
+        })
+
+    statuses = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            t1 = time.perf_counter()
+            response = await client.post("/api/users/login", json={"email": user_email(0), "password": BENCH_PASSWORD})
+            login = time.perf_counter()
+            statuses["first_login"] = response.status_code
+            headers = {"Authorization": "Bearer " + response.json().get("access_token", "")}
+
+            t2 = time.perf_counter()
+            response = await client.get("/api/travels/me", headers=headers)
+            listing = time.perf_counter()
+            statuses["first_listing"] = response.status_code
+    finally:
+        await app.router.shutdown()
+
+    return {
+        "interpreter_s": t0 - STARTED,
+        "import_s": imported - t0,
+        "startup_s": started - imported,
+        "ready_s": ready - imported,
+        "first_login_s": login - t1,
+        "first_listing_s": listing - t2,
+        "warmup": warmup.status(),
+        "statuses": statuses,
+    }
+
+
+def main():
+    mongomock = "--mongomock" in sys.argv
+    if mongomock:
+        from benchmarks.fixtures import configure_mongo
+        configure_mongo(None)
+    result = asyncio.run(measure(mongomock))
+    # Last line of stdout; the app's own log lines come before it
+    print(json.dumps(result, default=str))
+
+
+# ---------------------------------------------------------------------
+# Parent side: repeat cold starts and summarize them like scenarios
+# ---------------------------------------------------------------------
+COLD_START = "cold_start"
+COLD_START_DESCRIPTION = "Fresh worker process: import, startup, warmup, first login and first read"
+PHASES = {
+    "cold_import": "import_s",
+    "cold_startup": "startup_s",
+    "cold_ready": "ready_s",
+    "cold_first_login": "first_login_s",
+    "cold_first_listing": "first_listing_s",
+}
+
+
+async def cold_starts(runs: int, mongomock: bool, password_hash: str) -> dict:
+    import os
+    from collections import Counter
+    from benchmarks.runner import summarize
+
+    command = [sys.executable, "-m", "benchmarks.coldstart"]
+    if mongomock:
+        command += ["--mongomock", password_hash]
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    samples = {name: {"elapsed": 0.0, "latencies": [], "statuses": Counter()} for name in PHASES}
+    problems = []
+    for _ in range(runs):
+        proc = await asyncio.create_subprocess_exec(
+            *command, cwd=backend_dir, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            problems.append(f"cold start exited with {proc.returncode}: {stderr.decode()[-500:]}")
+            continue
+        result = json.loads(stdout.decode().strip().splitlines()[-1])
+        for name, key in PHASES.items():
+            sample = samples[name]
+            sample["latencies"].append(result[key])
+            sample["elapsed"] += result[key]
+            # Phases other than the two requests count as 200 once the process finished cleanly
+            sample["statuses"][str(result["statuses"].get(name[len("cold_"):], 200))] += 1
+        problems += [
+            f"warmup of {step} failed: {detail.get('error')}"
+            for step, detail in result["warmup"]["steps"].items() if not detail["ok"]
+        ]
+
+    results = {name: summarize(sample) for name, sample in samples.items()}
+    for summary in results.values():
+        summary["problems"] = []
+    results["cold_ready"]["problems"] = sorted(set(problems))
+    return results
+
+
+if __name__ == "__main__":
+    main()
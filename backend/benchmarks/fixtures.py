@@ -0,0 +1,109 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+# ---------------------------------------------------------------------
+# 🗄️ MongoDB fixture and seed data
+# ---------------------------------------------------------------------
+BENCH_DB_NAME = "fueltrackr_bench"
+BENCH_PASSWORD = "bench-password"
+ADMIN_EMAIL = "admin@bench.example.com"
+SEED_BATCH_SIZE = 5000
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@bench.example.com"
+
+
+def use_mongomock():
+    """
+    Point Motor at mongomock-motor. Must run before `app` is imported.
+    The shims cover driver options and index options mongomock ignores.
+    """
+    try:
+        import motor.motor_asyncio
+        import mongomock.collection
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("❌ --mongomock needs the packages in benchmarks/requirements.txt")
+
+    class BenchMongoMockClient(AsyncMongoMockClient):
+        def __init__(self, *args, **kwargs):
+            # Pool, timeout and listener options mean nothing in-process
+            super().__init__()
+
+    def create_indexes(self, indexes, session=None):
+        names = []
+        for index in indexes:
+            options = {k: v for k, v in index.document.items() if k != "key"}
+            names.append(self.create_index(list(index.document["key"].items()), **options))
+        return names
+
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    motor.motor_asyncio.AsyncIOMotorClient = BenchMongoMockClient
+    mongomock.collection.Collection.create_indexes = create_indexes
+    mongomock.collection.BulkOperationBuilder.add_update = add_update_without_sort
+
+
+def configure_mongo(mongo_url: str = None):
+    if mongo_url:
+        os.environ["MONGO_URL"] = mongo_url
+    else:
+        use_mongomock()
+        os.environ["MONGO_URL"] = "mongodb://mongomock"
+    os.environ["DB_NAME"] = BENCH_DB_NAME
+
+
+async def reset_database():
+    from app.database import client
+    await client.drop_database(BENCH_DB_NAME)
+
+
+async def seed(users: int, logs: int, rng: random.Random):
+    """
+    Insert `users` employees sharing one bcrypt hash (hashing each would
+    dominate setup time) plus an admin, and `logs` travel logs spread over
+    the last year.
+    """
+    from app.database import users_collection, travels_collection
+    from app.rollups import apply_rollups
+    from app.utils import hash_password
+
+    password_hash = hash_password(BENCH_PASSWORD)
+    now = datetime.utcnow()
+
+    people = [{
+        "name": "Bench Admin", "email": ADMIN_EMAIL, "password": password_hash,
+        "fuel_card_no": "0", "role": "admin", "created_at": now,
+    }]
+    for i in range(users):
+        people.append({
+            "name": f"User {i}", "email": user_email(i), "password": password_hash,
+            "fuel_card_no": str(100000 + i), "role": "employee", "created_at": now,
+        })
+    await users_collection.insert_many(people)
+
+    for start in range(0, logs, SEED_BATCH_SIZE):
+        batch = []
+        for _ in range(min(SEED_BATCH_SIZE, logs - start)):
+            created_at = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+            meter_start = rng.randint(0, 200000)
+            total = rng.randint(1, 400)
+            official = rng.randint(0, total)
+            batch.append({
+                "user_email": user_email(rng.randrange(users)),
+                "date": created_at.strftime("%Y-%m-%d"),
+                "meter_start": float(meter_start),
+                "meter_end": float(meter_start + total),
+                "official_km": float(official),
+                "private_km": float(total - official),
+                "total_km": float(total),
+                "remarks": "",
+                "created_at": created_at,
+            })
+        await travels_collection.insert_many(batch)
+        await apply_rollups(batch)
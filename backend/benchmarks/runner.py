@@ -0,0 +1,125 @@
+import time
+import asyncio
+import itertools
+from collections import Counter
+
+# ---------------------------------------------------------------------
+# ⏱️ Closed-loop load driver and latency statistics
+# ---------------------------------------------------------------------
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+async def drive(request, count: int, concurrency: int, offset: int = 0) -> dict:
+    """
+    Run `count` calls of `request(i)` from `concurrency` workers, each
+    sending its next request as soon as the previous one finished.
+    """
+    latencies = []
+    statuses = Counter()
+    indexes = itertools.count(offset)
+    end = offset + count
+
+    async def worker():
+        while True:
+            i = next(indexes)
+            if i >= end:
+                return
+            start = time.perf_counter()
+            try:
+                response = await request(i)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(1, min(concurrency, count)))])
+    return {"elapsed": time.perf_counter() - started, "latencies": latencies, "statuses": statuses}
+
+
+def summarize(run: dict, items_per_request: int = 1) -> dict:
+    latencies = sorted(run["latencies"])
+    count = len(latencies)
+    elapsed = run["elapsed"] or 1e-9
+    errors = sum(n for status, n in run["statuses"].items() if not status.startswith("2"))
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "statuses": dict(sorted(run["statuses"].items())),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2),
+        "items_per_s": round(count * items_per_request / elapsed, 2),
+        "mean_ms": ms(sum(latencies) / count) if count else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+    }
+
+# -------------------------
+# Reporting
+# -------------------------
+COLUMNS = [
+    ("scenario", 22), ("reqs", 7), ("errors", 7), ("req/s", 10), ("items/s", 11),
+    ("p50 ms", 11), ("p95 ms", 11), ("p99 ms", 11),
+]
+
+
+def format_table(results: dict) -> str:
+    lines = ["".join(title.ljust(width) if i == 0 else title.rjust(width) for i, (title, width) in enumerate(COLUMNS))]
+    for name, r in results.items():
+        values = [name, r["requests"], r["errors"], r["throughput_rps"], r["items_per_s"], r["p50_ms"], r["p95_ms"], r["p99_ms"]]
+        lines.append("".join(
+            str(v).ljust(width) if i == 0 else str(v).rjust(width)
+            for i, (v, (_, width)) in enumerate(zip(values, COLUMNS))
+        ))
+        if r["errors"]:
+            lines.append(f"  ⚠️ statuses: {r['statuses']}")
+        for key, value in r.get("details", {}).items():
+            lines.append(f"  📊 {key}: {value}")
+        for problem in r.get("problems", []):
+            lines.append(f"  ❌ {problem}")
+    return "\n".join(lines)
+
+# -------------------------
+# Baseline comparison
+# -------------------------
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+# Latency changes smaller than this are timer noise, whatever the ratio
+LATENCY_NOISE_MS = 1.0
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Return human-readable regressions: latency percentiles more than
+    `threshold` slower, throughput more than `threshold` lower, a higher
+    error rate, or a scenario that started failing its correctness check.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in LATENCY_KEYS:
+            if current[key] > base[key] * (1 + threshold) and current[key] - base[key] > LATENCY_NOISE_MS:
+                regressions.append(f"{name}: {key} {base[key]} -> {current[key]}")
+        if base["throughput_rps"] and current["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s "
+                f"({(current['throughput_rps'] / base['throughput_rps'] - 1) * 100:.0f}%)"
+            )
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {base['error_rate']} -> {current['error_rate']}")
+        if current.get("problems") and not base.get("problems"):
+            regressions.append(f"{name}: " + "; ".join(current["problems"]))
+    return regressions
@@ -0,0 +1,619 @@
+import time
+import secrets
+import asyncio
+import tracemalloc
+from collections import deque
+from types import SimpleNamespace
+from abc import ABC, abstractmethod
+import orjson
+from datetime import datetime, timedelta
+from benchmarks.fixtures import BENCH_PASSWORD, user_email
+from benchmarks.runner import drive, percentile
+
+# ---------------------------------------------------------------------
+# 🎬 Scripted scenarios
+# ---------------------------------------------------------------------
+# Each scenario issues one request per call to `request(ctx, i)`; `i` is
+# unique across warmup and measured requests so codes and keys never
+# collide. `verify` runs after the load and returns correctness problems,
+# which are reported next to the latency numbers; `report` returns extra
+# figures for the table and `teardown` undoes anything `setup` changed.
+
+SCENARIOS = {}
+
+# Returned by scenarios that time an in-process call instead of an HTTP request
+DONE = SimpleNamespace(status_code=200)
+
+
+def scenario(cls):
+    SCENARIOS[cls.name] = cls
+    return cls
+
+
+class Scenario(ABC):
+    name = ""
+    description = ""
+    items_per_request = 1
+
+    async def setup(self, ctx):
+        pass
+
+    @abstractmethod
+    async def request(self, ctx, i: int):
+        ...
+
+    async def verify(self, ctx) -> list:
+        return []
+
+    async def report(self, ctx) -> dict:
+        return {}
+
+    async def teardown(self, ctx):
+        pass
+
+
+def travel_body(ctx, i: int) -> dict:
+    # Continues employee i's odometer, which add_travel enforces
+    total = float(ctx.rng.randint(1, 400))
+    meter_start = ctx.next_trip(i, total)
+    return {
+        "meter_start": meter_start,
+        "meter_end": meter_start + total,
+        "official_km": total,
+        "private_km": 0.0,
+        "remarks": f"bench {i}",
+    }
+
+
+@scenario
+class LoginStorm(Scenario):
+    name = "login_storm"
+    description = "POST /api/users/login across seeded users (bcrypt bound)"
+
+    async def request(self, ctx, i):
+        return await ctx.client.post(
+            "/api/users/login",
+            json={"email": user_email(i % ctx.users), "password": BENCH_PASSWORD},
+        )
+
+
+@scenario
+class AbuseShedding(Scenario):
+    name = "abuse_shedding"
+    description = "POST /api/users/login with the rate limits on: one client hammering, normal clients alongside"
+    # Three of every four requests come from the abusive client
+    abuse_ratio = 4
+    abuser_ip = "203.0.113.66"
+
+    async def setup(self, ctx):
+        from app import rate_limit
+
+        # The harness turns every limit off; this scenario runs the defaults
+        self.saved = (dict(rate_limit.LIMITS), rate_limit.TRUST_FORWARDED_FOR)
+        for key in ("ip", "email"):
+            rate_limit.LIMITS[("login", key)] = rate_limit._parse_limit(rate_limit.DEFAULT_LIMITS["login"][key])
+        # Lets each client pick its address through X-Forwarded-For
+        rate_limit.TRUST_FORWARDED_FOR = True
+        self.latencies = {"normal": [], "abusive": []}
+        self.statuses = {"normal": [], "abusive": []}
+
+    async def request(self, ctx, i):
+        if i % self.abuse_ratio:
+            kind = "abusive"
+            ip = self.abuser_ip
+            body = {"email": "attacker@bench.example.com", "password": f"guess-{i}"}
+        else:
+            kind = "normal"
+            user = (i // self.abuse_ratio) % ctx.users
+            ip = f"10.1.{user // 256}.{user % 256}"
+            body = {"email": user_email(user), "password": BENCH_PASSWORD}
+
+        start = time.perf_counter()
+        response = await ctx.client.post("/api/users/login", json=body, headers={"X-Forwarded-For": ip})
+        if i >= ctx.warmup:
+            self.latencies[kind].append(time.perf_counter() - start)
+            self.statuses[kind].append(response.status_code)
+        return response
+
+    async def verify(self, ctx):
+        from app import rate_limit
+
+        problems = []
+        rejected = [status for status in self.statuses["normal"] if status != 200]
+        if rejected:
+            problems.append(f"{len(rejected)} normal logins failed (statuses {sorted(set(rejected))})")
+        allowed, _ = rate_limit.LIMITS[("login", "ip")]
+        passed = sum(1 for status in self.statuses["abusive"] if status != 429)
+        if passed > allowed:
+            problems.append(f"{passed} abusive requests got through a limit of {allowed}")
+        return problems
+
+    async def report(self, ctx):
+        ms = lambda latencies, pct: round(percentile(sorted(latencies), pct) * 1000, 3)
+        normal, abusive = self.latencies["normal"], self.latencies["abusive"]
+        return {
+            "normal p50/p99 ms": f"{ms(normal, 50)} / {ms(normal, 99)} over {len(normal)} logins (compare login_storm)",
+            "abusive p50 ms": ms(abusive, 50),
+            "abusive shed": f"{self.statuses['abusive'].count(429)} of {len(abusive)} answered 429",
+        }
+
+    async def teardown(self, ctx):
+        from app import rate_limit
+
+        limits, trust_forwarded_for = self.saved
+        rate_limit.LIMITS.clear()
+        rate_limit.LIMITS.update(limits)
+        rate_limit.TRUST_FORWARDED_FOR = trust_forwarded_for
+
+
+@scenario
+class TokenDecode(Scenario):
+    name = "token_decode"
+    description = "decode_token on repeat tokens (cached; cold decodes compared in the report)"
+    tokens = 2000
+
+    def _fresh_tokens(self) -> list:
+        from app.utils import create_access_token
+        return [create_access_token({"sub": user_email(n), "role": "employee", "n": secrets.token_hex(4)}) for n in range(self.tokens)]
+
+    async def setup(self, ctx):
+        from app.auth import decode_token
+
+        self.cached = self._fresh_tokens()
+        for token in self.cached:
+            decode_token(token)
+
+    async def request(self, ctx, i):
+        from app.auth import decode_token
+
+        decode_token(self.cached[i % self.tokens])
+        return DONE
+
+    async def verify(self, ctx):
+        from jose import jwt
+        from app.auth import decode_token
+        from app.config import JWT_SECRET, JWT_ALGORITHM
+
+        token = self.cached[0]
+        if decode_token(token) != jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM]):
+            return ["cached payload differs from a fresh decode"]
+        return []
+
+    async def report(self, ctx):
+        from app.auth import decode_token
+
+        tokens = self._fresh_tokens()
+        timings = {}
+        # First pass verifies every signature, the second is served from the cache
+        for label in ("cold", "cached"):
+            start = time.perf_counter()
+            for token in tokens:
+                decode_token(token)
+            timings[label] = (time.perf_counter() - start) / len(tokens)
+        return {
+            "cold µs/decode": round(timings["cold"] * 1e6, 2),
+            "cached µs/decode": round(timings["cached"] * 1e6, 2),
+            "speedup": f"{timings['cold'] / timings['cached']:.1f}x",
+        }
+
+
+@scenario
+class OIDCCallbackStorm(Scenario):
+    name = "oidc_callback_storm"
+    description = "GET /api/auth/callback with fresh codes against the stub WSO2"
+
+    async def setup(self, ctx):
+        from app.auth_events import auth_events
+
+        self.userinfo_calls = ctx.wso2.calls["userinfo"]
+        self.dropped = auth_events.dropped
+        self.callbacks = 0
+
+    async def request(self, ctx, i):
+        self.callbacks += 1
+        code = f"{i % ctx.users}-{secrets.token_hex(8)}"
+        return await ctx.client.get("/api/auth/callback", params={"code": code})
+
+    async def verify(self, ctx):
+        from app.auth_events import auth_events
+        from app.database import auth_events_collection
+
+        problems = []
+        calls = ctx.wso2.calls["userinfo"] - self.userinfo_calls
+        if calls:
+            problems.append(f"userinfo called {calls} times; ID tokens were not verified locally")
+
+        # Every login must reach the auth event log, written behind the requests
+        await auth_events.flush()
+        if auth_events.dropped > self.dropped:
+            problems.append(f"{auth_events.dropped - self.dropped} auth events dropped")
+        stored = await auth_events_collection.count_documents({"event": "oidc_login", "outcome": "success"})
+        if stored < self.callbacks:
+            problems.append(f"{stored} oidc_login events stored for {self.callbacks} callbacks")
+        return problems
+
+
+@scenario
+class ReplayStoreMemory(Scenario):
+    name = "replay_store_memory"
+    description = "InMemoryReplayStore.mark_used on a simulated clock, replaying codes still within their TTL"
+    items_per_request = 100
+    # Simulated callbacks per second and code TTL
+    rate = 50
+    ttl = 60
+    ttls_measured = 10
+
+    def _store(self):
+        from app.replay_store import InMemoryReplayStore
+        self.now = 0.0
+        return InMemoryReplayStore(ttl=self.ttl, clock=lambda: self.now)
+
+    async def _callback(self, store, code: str) -> bool:
+        self.now += 1 / self.rate
+        return await store.mark_used(code)
+
+    async def setup(self, ctx):
+        self.store = self._store()
+        # Codes a second short of their TTL, which must still be refused
+        self.recent = deque(maxlen=self.rate * (self.ttl - 1))
+        self.replays_accepted = 0
+        self.fresh_refused = 0
+
+    async def request(self, ctx, i):
+        for n in range(self.items_per_request):
+            code = f"{i}-{n}"
+            if not await self._callback(self.store, code):
+                self.fresh_refused += 1
+            if len(self.recent) == self.recent.maxlen and await self.store.mark_used(self.recent[0]):
+                self.replays_accepted += 1
+            self.recent.append(code)
+        return DONE
+
+    async def verify(self, ctx):
+        problems = []
+        if self.replays_accepted:
+            problems.append(f"{self.replays_accepted} codes replayed within their TTL")
+        if self.fresh_refused:
+            problems.append(f"{self.fresh_refused} fresh codes refused")
+
+        # Memory over many TTLs of callbacks must level off after the first
+        store = self._store()
+        self.samples = []
+        tracemalloc.start()
+        try:
+            for period in range(self.ttls_measured):
+                for n in range(self.rate * self.ttl):
+                    await self._callback(store, f"{period}-{n}")
+                self.samples.append(tracemalloc.get_traced_memory()[0])
+        finally:
+            tracemalloc.stop()
+        steady = self.samples[1]
+        if max(self.samples[1:]) > steady * 1.25:
+            problems.append(f"memory grew from {steady} to {max(self.samples[1:])} bytes after the first TTL")
+        return problems
+
+    async def report(self, ctx):
+        return {
+            "codes per TTL": self.rate * self.ttl,
+            "KiB after each TTL": " ".join(str(round(sample / 1024)) for sample in self.samples),
+        }
+
+
+@scenario
+class SessionStorm(Scenario):
+    name = "session_storm"
+    description = "GET /api/auth/session on sessions whose access tokens just expired"
+
+    async def setup(self, ctx):
+        from app.database import sessions_collection
+        from app.sessions import SESSION_COOKIE_NAME, session_store
+
+        self.cookies = []
+        for i in range(ctx.sessions):
+            response = await ctx.client.get("/api/auth/callback", params={"code": f"{i}-{secrets.token_hex(8)}"})
+            session_id = response.headers["set-cookie"].split(";", 1)[0].split("=", 1)[1]
+            self.cookies.append({"Cookie": f"{SESSION_COOKIE_NAME}={session_id}"})
+
+        # Every session now needs a refresh; concurrent requests must share it
+        await sessions_collection.update_many({}, {"$set": {"access_expires_at": 0}})
+        session_store.cache.clear()
+        self.refresh_calls = ctx.wso2.calls["refresh"]
+
+    async def request(self, ctx, i):
+        return await ctx.client.get("/api/auth/session", headers=self.cookies[i % len(self.cookies)])
+
+    async def verify(self, ctx):
+        calls = ctx.wso2.calls["refresh"] - self.refresh_calls
+        if calls != len(self.cookies):
+            return [f"{calls} upstream refreshes for {len(self.cookies)} expired sessions"]
+        return []
+
+
+@scenario
+class ProfileMe(Scenario):
+    name = "profile_me"
+    description = "GET /api/users/me with the profile cache (req/s without it in the report)"
+
+    async def request(self, ctx, i):
+        return await ctx.client.get("/api/users/me", headers=ctx.employee_headers(i))
+
+    async def _throughput(self, ctx) -> float:
+        run = await drive(lambda i: self.request(ctx, i), ctx.requests, ctx.concurrency)
+        return ctx.requests / run["elapsed"]
+
+    async def report(self, ctx):
+        from app.profile_cache import profile_cache
+
+        warm = await self._throughput(ctx)
+        # A zero-size cache drops every profile as soon as it is stored
+        saved = profile_cache.local.maxsize, profile_cache.shared
+        profile_cache.local.maxsize, profile_cache.shared = 0, None
+        profile_cache.local.clear()
+        try:
+            cold = await self._throughput(ctx)
+        finally:
+            profile_cache.local.maxsize, profile_cache.shared = saved
+        return {
+            "cache on req/s": round(warm, 2),
+            "cache off req/s": round(cold, 2),
+            "speedup": f"{warm / cold:.2f}x",
+        }
+
+
+@scenario
+class IngestSingle(Scenario):
+    name = "ingest_single"
+    description = "POST /api/travels/ one log per request"
+
+    async def request(self, ctx, i):
+        async with ctx.driver(i):
+            return await ctx.client.post("/api/travels/", json=travel_body(ctx, i), headers=ctx.employee_headers(i))
+
+
+@scenario
+class IngestBulk(Scenario):
+    name = "ingest_bulk"
+    description = "POST /api/travels/bulk with NDJSON batches"
+
+    async def setup(self, ctx):
+        self.items_per_request = ctx.bulk_size
+
+    async def request(self, ctx, i):
+        async with ctx.driver(i):
+            body = b"\n".join(orjson.dumps(travel_body(ctx, i)) for _ in range(ctx.bulk_size))
+            return await ctx.client.post(
+                "/api/travels/bulk",
+                content=body,
+                headers={**ctx.employee_headers(i), "Content-Type": "application/x-ndjson"},
+            )
+
+
+@scenario
+class IdempotencyRace(Scenario):
+    name = "idempotency_race"
+    description = "Concurrent POST /api/travels/ retries sharing an Idempotency-Key"
+
+    async def setup(self, ctx):
+        self.run_id = secrets.token_hex(4)
+        self.keys = set()
+        self.bodies = {}
+
+    async def request(self, ctx, i):
+        # Consecutive requests share a key, so concurrent workers race on it
+        group = i // ctx.race_fanout
+        key = f"race-{self.run_id}-{group}"
+        self.keys.add(key)
+        # Retries must carry an identical body or the key is rejected with 422
+        if group not in self.bodies:
+            meter_start = ctx.next_trip(group, 10.0)
+            self.bodies[group] = {"meter_start": meter_start, "meter_end": meter_start + 10, "official_km": 10.0, "private_km": 0.0}
+        body = self.bodies[group]
+        return await ctx.client.post(
+            "/api/travels/", json=body, headers={**ctx.employee_headers(group), "Idempotency-Key": key}
+        )
+
+    async def _claim_race(self, tasks: int) -> list:
+        """
+        Fire `tasks` claims of one fresh key straight at the store: exactly
+        one must own it and every other one must replay its response.
+        """
+        from app.idempotency import idempotency_store, request_fingerprint
+
+        user, key = "race@bench.example.com", f"claims-{self.run_id}"
+        fingerprint = request_fingerprint({"key": key})
+        response = {"msg": "✅ Travel log added", "id": key}
+
+        async def attempt():
+            stored = await idempotency_store.claim(user, key, fingerprint)
+            if stored is None:
+                # Hold the claim like an insert would, so the others are still waiting
+                await asyncio.sleep(0.05)
+                await idempotency_store.complete(user, key, response)
+                return "owner"
+            return "replayed" if stored == response else f"unexpected response {stored!r}"
+
+        outcomes = await asyncio.gather(*[attempt() for _ in range(tasks)], return_exceptions=True)
+        problems = [f"claim failed: {o!r}" for o in outcomes if isinstance(o, BaseException)]
+        problems += sorted({o for o in outcomes if isinstance(o, str) and o not in ("owner", "replayed")})
+        owners = outcomes.count("owner")
+        if owners != 1:
+            problems.append(f"{owners} of {tasks} concurrent claims owned the key")
+        return problems
+
+    async def verify(self, ctx):
+        from app.database import travels_collection
+        problems = []
+        inserted = await travels_collection.count_documents({"idempotency_key": {"$in": list(self.keys)}})
+        if inserted != len(self.keys):
+            problems.append(f"{inserted} logs inserted for {len(self.keys)} idempotency keys")
+        return problems + await self._claim_race(50)
+
+
+@scenario
+class AdminListing(Scenario):
+    name = "admin_listing"
+    description = "GET /api/travels/all walking keyset pages"
+
+    async def setup(self, ctx):
+        self.cursors = [None]
+        while len(self.cursors) < ctx.max_pages:
+            params = {"limit": ctx.page_size}
+            if self.cursors[-1]:
+                params["cursor"] = self.cursors[-1]
+            response = await ctx.client.get("/api/travels/all", params=params, headers=ctx.admin_headers)
+            next_cursor = response.headers.get("x-next-cursor")
+            if not next_cursor:
+                break
+            self.cursors.append(next_cursor)
+
+    async def request(self, ctx, i):
+        params = {"limit": ctx.page_size}
+        cursor = self.cursors[i % len(self.cursors)]
+        if cursor:
+            params["cursor"] = cursor
+        return await ctx.client.get("/api/travels/all", params=params, headers=ctx.admin_headers)
+
+
+@scenario
+class SerializeTravels(Scenario):
+    name = "serialize_travels"
+    description = "Encode 5000 travel documents with orjson (compared with jsonable_encoder in the report)"
+    documents = 5000
+    items_per_request = documents
+    repeats = 5
+
+    async def setup(self, ctx):
+        from bson import ObjectId
+        from app.database import travels_collection
+
+        seeded = await travels_collection.find({}).to_list(self.documents)
+        self.docs = [{**seeded[n % len(seeded)], "_id": ObjectId()} for n in range(self.documents)]
+
+    @staticmethod
+    def _orjson(docs) -> bytes:
+        from app.responses import MongoJSONResponse
+        return MongoJSONResponse(docs).body
+
+    @staticmethod
+    def _jsonable_encoder(docs) -> bytes:
+        # What returning the documents from a route cost before MongoJSONResponse
+        from bson import ObjectId
+        from fastapi.encoders import jsonable_encoder
+        from fastapi.responses import JSONResponse
+        return JSONResponse(jsonable_encoder(docs, custom_encoder={ObjectId: str})).body
+
+    async def request(self, ctx, i):
+        self._orjson(self.docs)
+        return DONE
+
+    async def verify(self, ctx):
+        if orjson.loads(self._orjson(self.docs)) != orjson.loads(self._jsonable_encoder(self.docs)):
+            return ["orjson and jsonable_encoder produce different JSON"]
+        return []
+
+    def _measure(self, encode) -> tuple:
+        start = time.perf_counter()
+        for _ in range(self.repeats):
+            encode(self.docs)
+        elapsed = (time.perf_counter() - start) / self.repeats
+        tracemalloc.start()
+        try:
+            encode(self.docs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return elapsed, peak
+
+    async def report(self, ctx):
+        results = {}
+        for label, encode in (("jsonable_encoder", self._jsonable_encoder), ("orjson", self._orjson)):
+            elapsed, peak = self._measure(encode)
+            results[label] = f"{elapsed * 1000:.1f} ms, peak {peak / 1024 / 1024:.1f} MiB allocated"
+        return results
+
+
+@scenario
+class AdminAnalytics(Scenario):
+    name = "admin_analytics"
+    description = "GET /api/admin/analytics over rotating 30-day windows (cache hits and misses)"
+    windows = 20
+
+    async def request(self, ctx, i):
+        end = datetime.utcnow().date() - timedelta(days=15 * (i % self.windows))
+        params = {
+            "metrics": ctx.analytics_metrics,
+            "date_from": (end - timedelta(days=30)).isoformat(),
+            "date_to": end.isoformat(),
+            "granularity": "week",
+        }
+        return await ctx.client.get("/api/admin/analytics", params=params, headers=ctx.admin_headers)
+
+
+@scenario
+class AdminExport(Scenario):
+    name = "admin_export"
+    description = "GET /api/travels/export streaming every log as CSV"
+
+    async def request(self, ctx, i):
+        return await ctx.client.get("/api/travels/export", params={"format": "csv"}, headers=ctx.admin_headers)
+
+
+@scenario
+class AdminUsersSingle(Scenario):
+    name = "admin_users_single"
+    description = "PUT /api/users/{email} one user per request (compare items/s with admin_users_bulk)"
+
+    async def request(self, ctx, i):
+        return await ctx.client.put(
+            f"/api/users/{user_email(i % ctx.users)}", json={"fuel_card_no": str(i)}, headers=ctx.admin_headers
+        )
+
+
+@scenario
+class AdminUsersBulk(Scenario):
+    name = "admin_users_bulk"
+    description = "POST /api/users/bulk updating many users in one bulk_write"
+
+    async def setup(self, ctx):
+        # Each email may appear once per request
+        self.items_per_request = min(ctx.bulk_size, ctx.users)
+        self.failed = 0
+
+    async def request(self, ctx, i):
+        start = i * self.items_per_request
+        operations = [
+            {"op": "update", "email": user_email((start + n) % ctx.users), "fuel_card_no": str(i)}
+            for n in range(self.items_per_request)
+        ]
+        response = await ctx.client.post("/api/users/bulk", json={"operations": operations}, headers=ctx.admin_headers)
+        if response.status_code == 200:
+            self.failed += len(operations) - response.json()["summary"].get("updated", 0)
+        return response
+
+    async def verify(self, ctx):
+        return [f"{self.failed} bulk operations were not applied"] if self.failed else []
+
+
+@scenario
+class ForgotPassword(Scenario):
+    name = "forgot_password"
+    description = "POST /api/users/forgot-password through the mail queue to the SMTP sink"
+
+    async def setup(self, ctx):
+        self.received = ctx.smtp.received
+        self.accepted = 0
+
+    async def request(self, ctx, i):
+        response = await ctx.client.post("/api/users/forgot-password", json={"email": user_email(i % ctx.users)})
+        if response.status_code == 200:
+            self.accepted += 1
+        return response
+
+    async def verify(self, ctx):
+        from app.mailer import mail_queue
+        for _ in range(300):
+            if ctx.smtp.received - self.received >= self.accepted:
+                return []
+            await asyncio.sleep(0.1)
+        delivered = ctx.smtp.received - self.received
+        return [f"{delivered} of {self.accepted} reset emails delivered (queue depth {mail_queue.queue.qsize()})"]
@@ -0,0 +1,231 @@
+import time
+import base64
+import socket
+import asyncio
+import secrets
+import threading
+from urllib.parse import parse_qs
+import rsa
+import uvicorn
+from jose import jwk, jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# ---------------------------------------------------------------------
+# 🧪 Local stand-ins for WSO2 IS and the SMTP relay
+# ---------------------------------------------------------------------
+
+def _b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _bind() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+class StubWSO2:
+    """
+    In-process token / userinfo / JWKS endpoints signing RS256 ID tokens,
+    served by uvicorn on a background thread. `latency_ms` is added to
+    every response to mimic the round trip to a real identity server.
+    """
+
+    KID = "bench-key"
+
+    def __init__(self, client_id: str, latency_ms: float = 0.0):
+        self.client_id = client_id
+        self.latency = latency_ms / 1000
+        self.access_ttl = 3600
+        self.calls = {"token": 0, "refresh": 0, "userinfo": 0, "jwks": 0, "revoke": 0}
+        public_key, private_key = rsa.newkeys(2048)
+        # Parsed once: constructing the key per token costs ~100 ms of validation
+        self._signing_key = jwk.construct(private_key.save_pkcs1().decode(), "RS256")
+        self._jwk = {
+            "kty": "RSA", "kid": self.KID, "use": "sig", "alg": "RS256",
+            "n": _b64url_uint(public_key.n), "e": _b64url_uint(public_key.e),
+        }
+        self._sock = _bind()
+        self.base_url = "http://127.0.0.1:%d" % self._sock.getsockname()[1]
+        self.issuer = self.base_url + "/oauth2/token"
+        self._server = None
+        self._thread = None
+
+    # -------------------------
+    # Endpoints
+    # -------------------------
+    async def _delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    @staticmethod
+    def email_for(code: str) -> str:
+        # Codes minted by the scenarios look like "<user index>-<nonce>"
+        return f"sso{code.split('-', 1)[0]}@bench.example.com"
+
+    async def token(self, request: Request):
+        await self._delay()
+        # Parsed by hand so the stub does not need python-multipart
+        form = {k: v[0] for k, v in parse_qs((await request.body()).decode()).items()}
+
+        if form.get("grant_type") == "refresh_token":
+            self.calls["refresh"] += 1
+            refresh_token = form.get("refresh_token", "")
+            if not refresh_token.startswith("rt-"):
+                return JSONResponse({"error": "invalid_grant"}, status_code=400)
+            # Rotate the refresh token like WSO2 does by default
+            return JSONResponse({
+                "access_token": secrets.token_urlsafe(32),
+                "refresh_token": "rt-" + secrets.token_urlsafe(32),
+                "token_type": "Bearer",
+                "expires_in": self.access_ttl,
+            })
+
+        self.calls["token"] += 1
+        code = form.get("code", "")
+        if not code:
+            return JSONResponse({"error": "invalid_grant"}, status_code=400)
+
+        now = int(time.time())
+        email = self.email_for(code)
+        access_token = secrets.token_urlsafe(32)
+        id_token = jwt.encode(
+            {
+                "iss": self.issuer, "aud": self.client_id, "sub": email, "email": email,
+                "iat": now, "exp": now + 3600,
+            },
+            self._signing_key,
+            algorithm="RS256",
+            headers={"kid": self.KID},
+            access_token=access_token,
+        )
+        return JSONResponse({
+            "access_token": access_token,
+            "refresh_token": "rt-" + secrets.token_urlsafe(32),
+            "id_token": id_token,
+            "token_type": "Bearer",
+            "expires_in": self.access_ttl,
+        })
+
+    async def userinfo(self, request: Request):
+        self.calls["userinfo"] += 1
+        await self._delay()
+        return JSONResponse({"sub": "unknown@bench.example.com", "email": "unknown@bench.example.com"})
+
+    async def revoke(self, request: Request):
+        self.calls["revoke"] += 1
+        await self._delay()
+        return JSONResponse({})
+
+    async def jwks(self, request: Request):
+        self.calls["jwks"] += 1
+        await self._delay()
+        return JSONResponse({"keys": [self._jwk]})
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    def env(self) -> dict:
+        return {
+            "WSO2_TOKEN_URL": self.base_url + "/oauth2/token",
+            "WSO2_USERINFO_URL": self.base_url + "/oauth2/userinfo",
+            "WSO2_JWKS_URL": self.base_url + "/oauth2/jwks",
+            "WSO2_REVOKE_URL": self.base_url + "/oauth2/revoke",
+            "WSO2_ISSUER": self.issuer,
+        }
+
+    def start(self):
+        app = Starlette(routes=[
+            Route("/oauth2/token", self.token, methods=["POST"]),
+            Route("/oauth2/userinfo", self.userinfo),
+            Route("/oauth2/jwks", self.jwks),
+            Route("/oauth2/revoke", self.revoke, methods=["POST"]),
+        ])
+        # Long keep-alive so the app never races a connection the stub is closing
+        config = uvicorn.Config(app, log_level="warning", access_log=False, lifespan="off", timeout_keep_alive=120)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [self._sock]}, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+        self._sock.close()
+
+
+class SMTPSink:
+    """
+    Minimal SMTP server that accepts and counts every message. Runs its
+    own event loop on a background thread, like a relay on the LAN would.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self._sock = _bind()
+        self.port = self._sock.getsockname()[1]
+        self._loop = asyncio.new_event_loop()
+        self._thread = None
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 bench-smtp ESMTP")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip().upper()
+                if command.startswith("EHLO"):
+                    await reply("250-bench-smtp\r\n250 8BITMIME")
+                elif command.startswith(("HELO", "MAIL", "RCPT", "RSET", "NOOP")):
+                    await reply("250 OK")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    self.received += 1
+                    await reply("250 OK queued")
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+    def env(self) -> dict:
+        return {
+            "SMTP_SERVER": "127.0.0.1",
+            "SMTP_PORT": str(self.port),
+            "SMTP_STARTTLS": "false",
+            "OUTLOOK_EMAIL": "",
+            "OUTLOOK_PASSWORD": "",
+            "MAIL_FROM": "bench@bench.example.com",
+        }
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, sock=self._sock))
+        self._loop.run_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
@@ -6,7 +6,9 @@ export default function Navbar() {
   const user = JSON.parse(localStorage.getItem("user") || "{}");
   const navigate = useNavigate();
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    // End the server-side WSO2 session (no-op for password logins)
+    await fetch("http://localhost:8000/api/auth/logout", { method: "POST", credentials: "include" }).catch(() => {});
     localStorage.removeItem("token");
     localStorage.removeItem("user");
     window.location.href = "/";
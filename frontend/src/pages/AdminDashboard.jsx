@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import {
   Box,
   Typography,
@@ -46,6 +46,7 @@ import {
   YAxis,
 } from "recharts";
 import API from "../services/api";
+import { subscribeTravelFeed } from "../services/liveFeed";
 import Travels from "./Travels";
 
 // 📦 PDF library
@@ -148,19 +149,51 @@ function AdminDashboard() {
     }
   };
 
-  // Fetch travel logs
+  // Insert or replace a log by id
+  const upsertLog = (list, log) => {
+    const index = list.findIndex((l) => l._id === log._id);
+    if (index === -1) return [...list, log];
+    const next = [...list];
+    next[index] = log;
+    return next;
+  };
+
+  // Fetch every travel log page by page; live events received meanwhile are re-applied on top
+  const pendingEvents = useRef(null);
   const fetchLogs = async () => {
+    pendingEvents.current = [];
     try {
-      const res = await API.get("/travels/all");
-      setLogs(res.data);
+      let all = [];
+      let cursor = null;
+      do {
+        const res = await API.get("/travels/all", { params: { limit: 5000, ...(cursor && { cursor }) } });
+        all = all.concat(res.data);
+        cursor = res.headers["x-next-cursor"];
+      } while (cursor);
+      setLogs(pendingEvents.current.reduce(upsertLog, all));
     } catch (err) {
       console.error("Error fetching logs:", err.response?.data || err.message);
+    } finally {
+      pendingEvents.current = null;
     }
   };
 
   useEffect(() => {
     fetchUsers();
-    fetchLogs();
+  }, []);
+
+  // ✅ Live updates: subscribe first, then load the list, so nothing falls in between
+  useEffect(() => {
+    return subscribeTravelFeed({
+      onOpen: fetchLogs,
+      onUnavailable: fetchLogs,
+      onEvent: (op, log) => {
+        // An update whose log was deleted before the lookup carries no document
+        if (!log) return;
+        if (pendingEvents.current) pendingEvents.current.push(log);
+        setLogs((prev) => upsertLog(prev, log));
+      },
+    });
   }, []);
 
   // Role update
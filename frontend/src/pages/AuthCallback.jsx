@@ -12,7 +12,8 @@ useEffect(() => {
   if (sessionStorage.getItem("usedCode") === code) return;
   sessionStorage.setItem("usedCode", code);
 
-  fetch(`http://localhost:8000/api/auth/callback?code=${code}`)
+  // credentials: the backend sets an HttpOnly session cookie for token refresh
+  fetch(`http://localhost:8000/api/auth/callback?code=${code}`, { credentials: "include" })
     .then((res) => res.json())
     .then((data) => {
       console.log("✅ Token Response:", data);
@@ -4,6 +4,9 @@ const API = axios.create({
   baseURL: "https://fueltracker-gtyc.onrender.com/api",  // ✅ added /api
 });
 
+// WSO2 session endpoints (same origin as the callback that set the cookie)
+export const AUTH_SESSION_URL = "http://localhost:8000/api/auth/session";
+
 // Add token to all requests if available
 API.interceptors.request.use((config) => {
   const token = localStorage.getItem("token");
@@ -13,4 +16,41 @@ API.interceptors.request.use((config) => {
   return config;
 });
 
+// Fresh access token from the server-side WSO2 session (HttpOnly cookie).
+// Concurrent 401s share one call; resolves to null without a session.
+let pendingRefresh = null;
+export function refreshAccessToken() {
+  if (!pendingRefresh) {
+    pendingRefresh = fetch(AUTH_SESSION_URL, { credentials: "include" })
+      .then((res) => (res.ok ? res.json() : null))
+      .then((data) => {
+        if (!data?.access_token) return null;
+        localStorage.setItem("token", data.access_token);
+        localStorage.setItem("user", JSON.stringify(data.user));
+        return data.access_token;
+      })
+      .catch(() => null)
+      .finally(() => {
+        pendingRefresh = null;
+      });
+  }
+  return pendingRefresh;
+}
+
+// ✅ Expired access token: renew it through the session instead of a WSO2 redirect, then retry once
+API.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const config = error.config;
+    if (error.response?.status !== 401 || !config || config._retried) {
+      throw error;
+    }
+    const token = await refreshAccessToken();
+    if (!token) throw error;
+    config._retried = true;
+    config.headers.Authorization = `Bearer ${token}`;
+    return API(config);
+  }
+);
+
 export default API;
@@ -0,0 +1,87 @@
+import API, { refreshAccessToken } from "./api";
+
+// Admin live feed of travel logs (Server-Sent Events).
+// Read with fetch because EventSource cannot send the bearer token.
+// onOpen fires once the server has registered a fresh subscription (load
+// the list then, so no change falls between the list and the feed); onUnavailable fires once if the feed cannot be reached.
+export function subscribeTravelFeed({ onEvent, onReset, onOpen, onUnavailable }) {
+  const controller = new AbortController();
+  let lastEventId = null;
+  let retry = 2000;
+  let reported = false; // onOpen or onUnavailable already fired
+  let renewed = false;
+
+  const handle = (raw) => {
+    let id = null;
+    let event = "message";
+    let data = "";
+    for (const line of raw.split("\n")) {
+      if (line.startsWith(":")) continue; // heartbeat
+      const [field, ...rest] = line.split(":");
+      const value = rest.join(":").replace(/^ /, "");
+      if (field === "id") id = value;
+      else if (field === "event") event = value;
+      else if (field === "data") data += value;
+      else if (field === "retry") retry = Number(value) || retry;
+    }
+    if (event === "reset") {
+      lastEventId = null;
+      onReset?.(); // the server then closes; the fresh reconnection fires onOpen
+    } else if (data) {
+      lastEventId = id;
+      onEvent(event, JSON.parse(data).log);
+    }
+  };
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const headers = { Authorization: `Bearer ${localStorage.getItem("token")}` };
+        if (lastEventId) headers["Last-Event-ID"] = lastEventId;
+        const res = await fetch(`${API.defaults.baseURL}/admin/stream`, { headers, signal: controller.signal });
+        // Expired token: renew it through the WSO2 session once, then reconnect
+        if (res.status === 401 && !renewed) {
+          renewed = true;
+          if (await refreshAccessToken()) continue;
+        }
+        if (res.status === 401 || res.status === 403) {
+          if (!reported) onUnavailable?.();
+          return;
+        }
+        if (!res.ok) throw new Error(`Live feed unavailable (${res.status})`);
+        renewed = false;
+
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+        let pendingOpen = !lastEventId;
+        let buffer = "";
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          // The server registers the subscription before sending its first chunk
+          if (pendingOpen) {
+            pendingOpen = false;
+            reported = true;
+            onOpen?.();
+          }
+          buffer += value;
+          let end;
+          while ((end = buffer.indexOf("\n\n")) >= 0) {
+            handle(buffer.slice(0, end));
+            buffer = buffer.slice(end + 2);
+          }
+        }
+      } catch (err) {
+        if (controller.signal.aborted) return;
+        console.warn("Live feed disconnected:", err.message);
+        if (!reported) {
+          reported = true;
+          onUnavailable?.();
+        }
+      }
+      await new Promise((resolve) => setTimeout(resolve, retry));
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+}